@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+并发工具调用压测
+在本地模拟服务器上并发调用 get_recommend_jobs_tool / send_greeting_tool，
+统计 1、8、64 并发下的每秒调用数
+
+用法: python benchmarks/bench_concurrency.py [--latency 0.05] [--calls 256]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_zhipin_server  # noqa: E402
+
+PORT = 18001
+
+
+async def run_level(client, concurrency: int, total_calls: int) -> float:
+    """以指定并发执行 total_calls 次工具调用，返回每秒调用数"""
+    remaining = total_calls
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if remaining % 2 == 0:
+                await client.call_tool("get_recommend_jobs_tool", {"page": worker_id % 5 + 1, "refresh": True})
+            else:
+                await client.call_tool("send_greeting_tool", {"security_id": f"sec-{remaining}", "job_id": f"job-{remaining}"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return total_calls / (time.perf_counter() - start)
+
+
+async def ignore_log(message):
+    """压测时丢弃服务端日志通知"""
+
+
+async def main(args):
+    from fastmcp import Client
+    import boss_zhipin_fastmcp_v2 as server
+
+    logging.getLogger("fastmcp").setLevel(logging.WARNING)
+    (await server.state.get_account()).update_login_status(is_logged_in=True, cookies={"wt2": "bench"}, bst="bench", login_step="logged_in")
+
+    async with Client(server.mcp, log_handler=ignore_log) as client:
+        # 预热连接池
+        await client.call_tool("get_recommend_jobs_tool", {"page": 1})
+        print(f"上游延迟 {args.latency * 1000:.0f}ms，每档 {args.calls} 次调用")
+        for concurrency in (1, 8, 64):
+            calls = min(args.calls, 32) if concurrency == 1 else args.calls
+            rate = await run_level(client, concurrency, calls)
+            print(f"并发 {concurrency:>3}: {rate:8.1f} 次/秒")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发工具调用压测")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--calls", type=int, default=256)
+    args = parser.parse_args()
+
+    os.environ["BOSS_ZP_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+    # 本地数据写到临时目录，不污染工作目录
+    data_dir = tempfile.mkdtemp(prefix="boss-zp-bench-")
+    os.environ["BOSS_ZP_STORE_DIR"] = os.path.join(data_dir, "sessions")
+    os.environ["BOSS_ZP_JOB_INDEX"] = os.path.join(data_dir, "jobs.db")
+    os.environ["BOSS_ZP_GREETED_FILE"] = os.path.join(data_dir, "greeted.json")
+    os.environ.setdefault("BOSS_ZP_LOG_LEVEL", "WARNING")
+    # 测的是服务端自身的开销，默认关闭上游限流；需要时可在环境变量中设置
+    os.environ.setdefault("BOSS_ZP_RATE_GLOBAL", "0")
+    os.environ.setdefault("BOSS_ZP_RATE_PER_ACCOUNT", "0")
+    fake = fake_zhipin_server.start_subprocess(port=PORT, latency=args.latency)
+    try:
+        asyncio.run(main(args))
+    finally:
+        fake.terminate()
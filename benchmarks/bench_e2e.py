@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+端到端压测
+在本地模拟服务器上通过 MCP 客户端调用真实的工具：
+login_full_auto（用 wait_for_login_step_tool 等待登录完成）、get_recommend_jobs_tool、send_greeting_tool，
+统计每个工具的 p50/p99 延迟、吞吐量和错误数
+
+用法: python benchmarks/bench_e2e.py [--logins 8] [--calls 200] [--concurrency 16]
+      [--latency 0.05] [--jitter 0.02] [--error-rate 0.0] [--prewarm]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_zhipin_server  # noqa: E402
+
+PORT = 18003
+
+
+def percentile(values, pct: float) -> float:
+    """最近秩法百分位"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name: str, latencies: list, errors: int, elapsed: float):
+    print(
+        f"{name:<28} 次数 {len(latencies):>5}  错误 {errors:>4}  "
+        f"p50 {percentile(latencies, 50) * 1000:8.1f}ms  p99 {percentile(latencies, 99) * 1000:8.1f}ms  "
+        f"吞吐 {len(latencies) / elapsed:8.1f}/s"
+    )
+
+
+def is_error(text: str) -> bool:
+    data = json.loads(text)
+    return "error" in data or data.get("status") == "error"
+
+
+async def ignore_log(message):
+    """压测时丢弃服务端日志通知"""
+
+
+async def run_calls(client, make_call, total: int, concurrency: int):
+    """以指定并发执行 total 次调用，返回 (延迟列表, 错误数, 总耗时)"""
+    latencies, errors = [], 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            name, arguments = make_call(index)
+            start = time.perf_counter()
+            result = await client.call_tool(name, arguments, raise_on_error=False)
+            latencies.append(time.perf_counter() - start)
+            if result.is_error or is_error(result.content[0].text):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def bench_logins(client, count: int, timeout: float):
+    """并发发起登录并等待全部完成，返回 (工具调用延迟, 完整登录耗时, 失败数, 总耗时)"""
+    async def login(index: int):
+        account_id = f"bench-{index}"
+        start = time.perf_counter()
+        await client.call_tool("login_full_auto", {"account_id": account_id})
+        call_latency = time.perf_counter() - start
+        result = await client.call_tool(
+            "wait_for_login_step_tool",
+            {"account_id": account_id, "target_step": "logged_in", "timeout": timeout}
+        )
+        if json.loads(result.content[0].text).get("status") == "reached":
+            return call_latency, time.perf_counter() - start
+        return call_latency, None
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    call_latencies = [r[0] for r in results]
+    complete = [r[1] for r in results if r[1] is not None]
+    return call_latencies, complete, count - len(complete), elapsed
+
+
+async def main(args):
+    from fastmcp import Client
+    import boss_zhipin_fastmcp_v2 as server
+
+    logging.getLogger("fastmcp").setLevel(logging.WARNING)
+
+    async with Client(server.mcp, log_handler=ignore_log) as client:
+        print(f"上游延迟 {args.latency * 1000:.0f}ms (+{args.jitter * 1000:.0f}ms 抖动)，错误率 {args.error_rate:.0%}，并发 {args.concurrency}")
+        if args.prewarm:
+            # 等预热池装满再开始计时
+            while server.login_prewarmer.stats()["ready"] < args.logins:
+                await asyncio.sleep(0.05)
+            print(f"已预申请 {args.logins} 个二维码")
+
+        call_latencies, complete, failed, elapsed = await bench_logins(client, args.logins, args.login_timeout)
+        report("login_full_auto (工具调用)", call_latencies, 0, elapsed)
+        if complete:
+            report("login_full_auto (完成登录)", complete, failed, elapsed)
+        else:
+            print(f"login_full_auto (完成登录)    全部 {failed} 个登录超时")
+
+        accounts = [f"bench-{i}" for i in range(args.logins)]
+
+        def jobs_call(index: int):
+            return "get_recommend_jobs_tool", {
+                "page": index % 10 + 1,
+                "account_id": accounts[index % len(accounts)],
+                "refresh": True,
+            }
+
+        def greeting_call(index: int):
+            return "send_greeting_tool", {
+                "security_id": f"sec-{index}",
+                "job_id": f"job-{index}",
+                "account_id": accounts[index % len(accounts)],
+            }
+
+        for name, make_call in (("get_recommend_jobs_tool", jobs_call), ("send_greeting_tool", greeting_call)):
+            latencies, errors, elapsed = await run_calls(client, make_call, args.calls, args.concurrency)
+            report(name, latencies, errors, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--scan-delay", type=float, default=0.3)
+    parser.add_argument("--confirm-delay", type=float, default=0.3)
+    parser.add_argument("--login-timeout", type=float, default=60.0)
+    parser.add_argument("--prewarm", action="store_true", help="开启登录预热")
+    args = parser.parse_args()
+
+    os.environ["BOSS_ZP_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+    # 本地数据写到临时目录，不污染工作目录
+    data_dir = tempfile.mkdtemp(prefix="boss-zp-bench-")
+    os.environ["BOSS_ZP_STORE_DIR"] = os.path.join(data_dir, "sessions")
+    os.environ["BOSS_ZP_JOB_INDEX"] = os.path.join(data_dir, "jobs.db")
+    os.environ["BOSS_ZP_GREETED_FILE"] = os.path.join(data_dir, "greeted.json")
+    os.environ.setdefault("BOSS_ZP_LOG_LEVEL", "WARNING")
+    # 测的是服务端自身的开销，默认关闭上游限流；需要时可在环境变量中设置
+    os.environ.setdefault("BOSS_ZP_RATE_GLOBAL", "0")
+    os.environ.setdefault("BOSS_ZP_RATE_PER_ACCOUNT", "0")
+    if args.prewarm:
+        os.environ["BOSS_ZP_PREWARM"] = "1"
+        os.environ["BOSS_ZP_PREWARM_QR_POOL"] = str(args.logins)
+
+    fake = fake_zhipin_server.start_subprocess(
+        port=PORT,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        scan_delay=args.scan_delay,
+        confirm_delay=args.confirm_delay,
+    )
+    try:
+        asyncio.run(main(args))
+    finally:
+        fake.terminate()
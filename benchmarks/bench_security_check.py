@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+安全验证耗时测试
+在本地模拟服务器上执行 complete_security_check，分别统计冷启动浏览器和
+常驻浏览器池（热）的单次耗时；--workers 大于 0 时改用工作进程池，并统计 --parallel 路并发的吞吐；
+--engine js 时只使用嵌入式 JS 引擎，对比无需 Chromium 时的耗时和内存；
+complete_security_check 失败时会退回初始 Cookie，所以每次都检查是否拿到了 __zp_stoken__，缺失时以非零状态退出
+
+用法: python benchmarks/bench_security_check.py [--runs 10] [--workers 0] [--parallel 4] [--engine browser]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_zhipin_server  # noqa: E402
+
+PORT = 18002
+
+
+class SecurityCheckFailed(Exception):
+    pass
+
+
+async def main(args):
+    import boss_zhipin_fastmcp_v2 as server
+
+    cookies = {"wt2": "bench", "bst": "bench"}
+
+    async def check():
+        final_cookies = await server.BossZhipinAPI.complete_security_check(cookies)
+        if "__zp_stoken__" not in final_cookies:
+            raise SecurityCheckFailed("安全验证未拿到 __zp_stoken__，计时无效")
+
+    try:
+        start = time.perf_counter()
+        await check()
+        cold = time.perf_counter() - start
+
+        warm = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            await check()
+            warm.append(time.perf_counter() - start)
+
+        if args.workers:
+            # 先让每个工作进程都启动好浏览器，再统计并发吞吐
+            await asyncio.gather(*(check() for _ in range(args.workers)))
+            start = time.perf_counter()
+            await asyncio.gather(*(check() for _ in range(args.runs * args.parallel)))
+            parallel_elapsed = time.perf_counter() - start
+    finally:
+        if args.workers:
+            server.security_workers.close()
+        await server.browser_pool.close()
+
+    print(f"冷启动: {cold * 1000:8.1f} ms")
+    print(f"热: 平均 {statistics.mean(warm) * 1000:8.1f} ms, 最大 {max(warm) * 1000:8.1f} ms ({args.runs} 次)")
+    if args.workers:
+        print(f"{args.workers} 个工作进程、{args.parallel} 路并发: 吞吐 {args.runs * args.parallel / parallel_elapsed:6.1f} 次/秒")
+    # 浏览器引擎的内存主要在 Chromium 子进程中，这里只统计本进程
+    print(f"本进程峰值内存: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="安全验证耗时测试")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0, help="安全验证工作进程数，0 表示在本进程内执行")
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--engine", choices=("auto", "js", "browser"), default="browser", help="安全验证引擎")
+    args = parser.parse_args()
+
+    os.environ["BOSS_ZP_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+    os.environ["BOSS_ZP_SECURITY_WORKERS"] = str(args.workers)
+    os.environ["BOSS_ZP_SECURITY_ENGINE"] = args.engine
+    os.environ.setdefault("BOSS_ZP_LOG_LEVEL", "WARNING")
+    fake = fake_zhipin_server.start_subprocess(port=PORT)
+    try:
+        asyncio.run(main(args))
+    except SecurityCheckFailed as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        fake.terminate()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+职位记录内存与序列化耗时测试
+对比旧的「每个职位一个 dict + json.dumps(indent=2)」与 JobInfo(slots) + dumps_json
+
+用法: python benchmarks/bench_serialization.py [--jobs 10000]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_zhipin_server import make_job  # noqa: E402
+
+
+def legacy_job_dict(job: dict) -> dict:
+    """旧版 get_job_list 中逐个构建的职位 dict"""
+    return {
+        "securityId": job.get("securityId"),
+        "encryptBossId": job.get("encryptBossId"),
+        "jobDegree": job.get("jobDegree"),
+        "jobName": job.get("jobName"),
+        "lid": job.get("lid"),
+        "salaryDesc": job.get("salaryDesc"),
+        "jobLabels": job.get("jobLabels", []),
+        "skills": job.get("skills", []),
+        "jobExperience": job.get("jobExperience"),
+        "cityName": job.get("cityName"),
+        "areaDistrict": job.get("areaDistrict"),
+        "encryptBrandId": job.get("encryptBrandId"),
+        "brandName": job.get("brandName"),
+        "brandScaleName": job.get("brandScaleName"),
+        "industry": job.get("industry"),
+        "contact": job.get("contact", False),
+        "showTopPosition": job.get("showTopPosition", False)
+    }
+
+
+def measure_memory(build, raw_jobs) -> tuple:
+    """返回 (构建结果, 结果占用的字节数)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build(raw_jobs)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+
+def measure_time(func, repeat: int) -> float:
+    """返回多次执行中最快一次的耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def wrap(jobs) -> dict:
+    return {"status": "success", "data": {"hasMore": False, "jobList": jobs, "total": len(jobs)}}
+
+
+def main(args):
+    import boss_zhipin_fastmcp_v2 as server
+
+    # 原始数据各字段独立分配，避免与构建结果共享字符串对象
+    raw_jobs = [json.loads(json.dumps(make_job(i // 15 + 1, i % 15))) for i in range(args.jobs)]
+
+    legacy, legacy_bytes = measure_memory(lambda raw: [legacy_job_dict(job) for job in raw], raw_jobs)
+    slotted, slotted_bytes = measure_memory(lambda raw: [server.JobInfo.from_api(job) for job in raw], raw_jobs)
+
+    legacy_ms = measure_time(lambda: json.dumps(wrap(legacy), ensure_ascii=False, indent=2), args.repeat)
+    compact_ms = measure_time(lambda: server.dumps_json(wrap(slotted)), args.repeat)
+    pretty_ms = measure_time(lambda: server.dumps_json(wrap(slotted), pretty=True), args.repeat)
+
+    backend = "orjson" if server.orjson is not None else "json"
+    print(f"{args.jobs} 个职位")
+    print(f"内存   dict 记录: {legacy_bytes / 1024 / 1024:7.2f} MB   JobInfo(slots): {slotted_bytes / 1024 / 1024:7.2f} MB")
+    print(f"序列化 dict + json.dumps(indent=2): {legacy_ms:8.1f} ms")
+    print(f"序列化 JobInfo + dumps_json 紧凑({backend}): {compact_ms:8.1f} ms")
+    print(f"序列化 JobInfo + dumps_json 缩进({backend}): {pretty_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="职位记录内存与序列化耗时测试")
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
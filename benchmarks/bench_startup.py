@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+启动耗时测试
+每次都在新的 Python 进程中：
+- 统计导入 boss_zhipin_fastmcp_v2 的耗时，并检查 playwright / Crypto / py_mini_racer 是否被提前导入
+- 以 stdio 方式启动服务器，统计从启动进程到 list_tools、读取 boss-zp://config 首次返回的耗时
+
+用法: python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 导入后不应加载的重量级依赖
+LAZY_MODULES = ("playwright", "Crypto", "py_mini_racer")
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+sys.path.insert(0, {str(ROOT)!r})
+start = time.perf_counter()
+import boss_zhipin_fastmcp_v2
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+SERVE_SCRIPT = f"""
+import sys
+sys.path.insert(0, {str(ROOT)!r})
+import boss_zhipin_fastmcp_v2
+boss_zhipin_fastmcp_v2.mcp.run(transport="stdio", show_banner=False)
+"""
+
+
+def server_env(data_dir: str) -> dict:
+    """本地数据写到临时目录，不污染工作目录"""
+    env = dict(os.environ)
+    env["BOSS_ZP_STORE_DIR"] = os.path.join(data_dir, "sessions")
+    env["BOSS_ZP_JOB_INDEX"] = os.path.join(data_dir, "jobs.db")
+    env["BOSS_ZP_GREETED_FILE"] = os.path.join(data_dir, "greeted.json")
+    env.setdefault("BOSS_ZP_LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_import(env: dict) -> dict:
+    """在新进程中导入服务器模块"""
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", IMPORT_SCRIPT],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+async def measure_first_response(env: dict, data_dir: str) -> tuple:
+    """以 stdio 方式启动服务器，返回 (list_tools 耗时, 读取配置耗时)"""
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+
+    transport = StdioTransport(
+        command=sys.executable,
+        args=["-W", "ignore", "-c", SERVE_SCRIPT],
+        env=env,
+        cwd=data_dir,
+        keep_alive=False,
+        log_file=Path(data_dir) / "server.log",  # 服务端的标准错误输出
+    )
+    start = time.perf_counter()
+    async with Client(transport) as client:
+        await client.list_tools()
+        tools = time.perf_counter() - start
+        await client.read_resource("boss-zp://config")
+        config = time.perf_counter() - start
+    return tools, config
+
+
+def report(name: str, values: list):
+    print(f"{name:<28} 中位数 {statistics.median(values) * 1000:8.1f}ms  最小 {min(values) * 1000:8.1f}ms  最大 {max(values) * 1000:8.1f}ms")
+
+
+def main(args):
+    data_dir = tempfile.mkdtemp(prefix="boss-zp-bench-")
+    env = server_env(data_dir)
+
+    imports, loaded = [], set()
+    for _ in range(args.runs):
+        result = measure_import(env)
+        imports.append(result["seconds"])
+        loaded.update(result["loaded"])
+
+    tools, config = [], []
+    for _ in range(args.runs):
+        tools_elapsed, config_elapsed = asyncio.run(measure_first_response(env, data_dir))
+        tools.append(tools_elapsed)
+        config.append(config_elapsed)
+
+    report("导入模块", imports)
+    report("启动到 list_tools 返回", tools)
+    report("启动到读取配置返回", config)
+    if loaded:
+        print(f"警告: 导入时已加载 {', '.join(sorted(loaded))}")
+    else:
+        print(f"导入时未加载 {', '.join(LAZY_MODULES)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动耗时测试")
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Redis 协议本地替身
+实现共享状态后端（RedisStateBackend）用到的命令：PING、AUTH、SELECT、GET、SET（NX/XX/PX/EX）、
+DEL、PEXPIRE、SCAN，以及租约续期/释放用的"比较持有者后执行"形式的 EVAL 脚本，
+用于没有 Redis 时在本机测试多副本部署；不支持的命令返回错误（redis-py 连接时的 CLIENT SETINFO 会被忽略）
+
+用法: python benchmarks/fake_redis_server.py [--port 16379]
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+# key -> (value, 过期时间)
+data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+
+
+def alive(key: bytes) -> Optional[bytes]:
+    item = data.get(key)
+    if item is None:
+        return None
+    value, expires = item
+    if expires is not None and expires <= time.monotonic():
+        del data[key]
+        return None
+    return value
+
+
+def encode(reply) -> bytes:
+    """把返回值编码为 RESP"""
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-ERR %s\r\n" % str(reply).encode("utf-8")
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode("utf-8")
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+def cmd_set(args):
+    key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+    expires = None
+    for name, unit in ((b"PX", 1000), (b"EX", 1)):
+        if name in options:
+            expires = time.monotonic() + int(args[2 + options.index(name) + 1]) / unit
+    exists = alive(key) is not None
+    if (b"NX" in options and exists) or (b"XX" in options and not exists):
+        return None
+    data[key] = (value, expires)
+    return "OK"
+
+
+def cmd_pexpire(args):
+    value = alive(args[0])
+    if value is None:
+        return 0
+    data[args[0]] = (value, time.monotonic() + int(args[1]) / 1000)
+    return 1
+
+
+def cmd_scan(args):
+    # 一次返回全部匹配的键，游标总是 0
+    pattern = args[args.index(b"MATCH") + 1].decode("utf-8") if b"MATCH" in args else "*"
+    keys = [key for key in list(data) if alive(key) is not None and fnmatch.fnmatchcase(key.decode("utf-8"), pattern)]
+    return [b"0", keys]
+
+
+# if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('<命令>', KEYS[1][, ARGV[2]]) end return 0
+COMPARE_SCRIPT_RE = re.compile(
+    rb"if redis\.call\('GET', KEYS\[1\]\) == ARGV\[1\] then "
+    rb"return redis\.call\('(\w+)', KEYS\[1\](, ARGV\[2\])?\) end return 0"
+)
+
+
+def cmd_eval(args):
+    """只支持先比较键值再执行一条命令的脚本；单线程执行，与 Redis 一样是原子的"""
+    match = COMPARE_SCRIPT_RE.fullmatch(args[0].strip())
+    if match is None or int(args[1]) != 1:
+        raise ValueError("unsupported script")
+    key, argv = args[2], args[3:]
+    if alive(key) != argv[0]:
+        return 0
+    command = [key, argv[1]] if match.group(2) else [key]
+    return COMMANDS[match.group(1).upper()](command)
+
+
+COMMANDS = {
+    b"PING": lambda args: "PONG",
+    b"AUTH": lambda args: "OK",
+    b"SELECT": lambda args: "OK",
+    b"GET": lambda args: alive(args[0]),
+    b"SET": cmd_set,
+    b"DEL": lambda args: sum(1 for key in args if alive(key) is not None and data.pop(key)),
+    b"PEXPIRE": cmd_pexpire,
+    b"SCAN": cmd_scan,
+    b"EVAL": cmd_eval,
+}
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[list]:
+    line = await reader.readline()
+    if not line:
+        return None
+    count = int(line[1:-2])
+    args = []
+    for _ in range(count):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            args = await read_command(reader)
+            if args is None:
+                break
+            handler = COMMANDS.get(args[0].upper())
+            try:
+                reply = handler(args[1:]) if handler else ValueError(f"unknown command '{args[0].decode()}'")
+            except (IndexError, ValueError) as e:
+                reply = e
+            writer.write(encode(reply))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_subprocess(port: int = 16379) -> subprocess.Popen:
+    """在独立进程中启动替身服务器"""
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"Redis 替身启动失败，端口 {port}")
+
+
+async def main(host: str, port: int):
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redis 协议本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=16379)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
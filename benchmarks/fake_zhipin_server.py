@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Boss直聘接口本地模拟服务器
+用于离线测试和压测，实现与 boss_zhipin_fastmcp_v2.py 相同路径的接口：
+
+- 登录：captcha/randkey、qrcode/getqrcode、qrcode/scan、qrcode/scanLogin、qrcode/dispatcher
+- 业务：recommend/job/list.json、friend/add.json、getUserInfo.json
+- 安全验证：security-check.html（JS 延迟写入 __zp_stoken__）
+
+延迟和错误率可通过命令行参数设置，运行中也可以 POST /__fake__/config 调整
+"""
+
+import argparse
+import asyncio
+import base64
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Dict
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+
+@dataclass
+class FakeServerConfig:
+    """模拟服务器配置"""
+    latency: float = 0.05  # 普通接口的响应延迟（秒）
+    jitter: float = 0.0  # 在 latency 基础上随机增加的延迟上限（秒）
+    error_rate: float = 0.0  # 返回 HTTP 500 的概率
+    business_error_rate: float = 0.0  # 返回 code != 0 的概率
+    total_pages: int = 10  # 推荐职位总页数
+    page_size: int = 15
+    scan_delay: float = 1.0  # 生成二维码后多久视为已扫码（秒）
+    confirm_delay: float = 1.0  # 扫码后多久视为已确认（秒）
+    long_poll_timeout: float = 30.0  # 扫码/确认长轮询的挂起时长（秒）
+    stoken_delay_ms: int = 200  # 安全验证页面写入 __zp_stoken__ 前的JS延迟
+
+
+config = FakeServerConfig()
+
+# qrId -> 二维码生成时间
+qr_codes: Dict[str, float] = {}
+
+# 1x1 透明 PNG，作为二维码图片
+QR_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def make_job(page: int, index: int) -> dict:
+    """生成一条模拟职位数据"""
+    n = (page - 1) * config.page_size + index
+    return {
+        "securityId": f"sec-{n}",
+        "encryptBossId": f"boss-{n}",
+        "encryptJobId": f"job-{n}",
+        "jobDegree": "本科",
+        "jobName": f"Python开发工程师 {n}",
+        "lid": f"lid-{n}",
+        "salaryDesc": "20-40K",
+        "jobLabels": ["3-5年", "本科"],
+        "skills": ["Python", "Django", "Redis"],
+        "jobExperience": "3-5年",
+        "cityName": "北京",
+        "areaDistrict": "海淀区",
+        "encryptBrandId": f"brand-{n % 50}",
+        "brandName": f"示例公司{n % 50}",
+        "brandScaleName": "100-499人",
+        "industry": "互联网",
+        "contact": False,
+        "showTopPosition": False,
+    }
+
+
+async def inject_faults() -> Response:
+    """按配置注入延迟和错误，需要返回错误时返回对应响应"""
+    await asyncio.sleep(config.latency + random.uniform(0, config.jitter))
+    if random.random() < config.error_rate:
+        return JSONResponse({"error": "injected"}, status_code=500)
+    if random.random() < config.business_error_rate:
+        return JSONResponse({"code": 17, "message": "您的操作过于频繁", "zpData": {}})
+    return None
+
+
+async def randkey(request: Request) -> JSONResponse:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    qr_id = f"bosszp-{uuid.uuid4()}"
+    qr_codes[qr_id] = time.monotonic()
+    return JSONResponse({"code": 0, "message": "Success", "zpData": {"qrId": qr_id}})
+
+
+async def getqrcode(request: Request) -> Response:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    return Response(QR_PNG, media_type="image/png")
+
+
+async def wait_until(ready_at: float) -> bool:
+    """长轮询：在 ready_at 之前挂起，超过 long_poll_timeout 仍未就绪则返回 False"""
+    wait = ready_at - time.monotonic()
+    if wait > config.long_poll_timeout:
+        await asyncio.sleep(config.long_poll_timeout)
+        return False
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return True
+
+
+async def scan(request: Request) -> JSONResponse:
+    created = qr_codes.get(request.query_params.get("uuid"))
+    if created is None:
+        return JSONResponse({"msg": "invalid qrId"}, status_code=404)
+    if await wait_until(created + config.scan_delay):
+        return JSONResponse({"scaned": True, "msg": "scaned"})
+    return JSONResponse({"scaned": False, "msg": "timeout"})
+
+
+async def scan_login(request: Request) -> JSONResponse:
+    created = qr_codes.get(request.query_params.get("qrId"))
+    if created is None:
+        return JSONResponse({"msg": "invalid qrId"}, status_code=404)
+    if await wait_until(created + config.scan_delay + config.confirm_delay):
+        return JSONResponse({"code": 0, "msg": "confirmed"})
+    return JSONResponse({"msg": "timeout"}, status_code=409)
+
+
+async def dispatcher(request: Request) -> Response:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    qr_id = request.query_params.get("qrId", "")
+    token = uuid.uuid4().hex
+    response = Response(status_code=302, headers={"Location": "/web/geek/jobs"})
+    # 与真实接口一样分多条 Set-Cookie 返回，其中包含带逗号的 Expires 日期
+    response.headers.append("Set-Cookie", f"wt2=wt2-{token}; Path=/; HttpOnly")
+    response.headers.append("Set-Cookie", f"bst=bst-{token}; Expires=Wed, 21 Oct 2037 07:28:00 GMT; Path=/")
+    response.headers.append("Set-Cookie", f"zp_at=at-{qr_id[-8:]}; Max-Age=86400; Path=/")
+    return response
+
+
+async def security_check(request: Request) -> HTMLResponse:
+    """模拟安全验证页面：JS 延迟写入 __zp_stoken__"""
+    return HTMLResponse(f"""<!DOCTYPE html>
+<html><body><script>
+setTimeout(function () {{
+  document.cookie = "__zp_stoken__=fake" + Date.now() + "; path=/";
+}}, {config.stoken_delay_ms});
+</script></body></html>""")
+
+
+async def user_info(request: Request) -> JSONResponse:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    if "wt2=" not in request.headers.get("cookie", ""):
+        return JSONResponse({"code": 7, "message": "当前登录状态已失效", "zpData": {}})
+    return JSONResponse({"code": 0, "message": "Success", "zpData": {"userId": 1, "name": "测试用户"}})
+
+
+async def job_list(request: Request) -> JSONResponse:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    page = int(request.query_params.get("page", 1))
+    jobs = [make_job(page, i) for i in range(config.page_size)] if page <= config.total_pages else []
+    return JSONResponse({
+        "code": 0,
+        "message": "Success",
+        "zpData": {"hasMore": page < config.total_pages, "jobList": jobs},
+    })
+
+
+async def friend_add(request: Request) -> JSONResponse:
+    fault = await inject_faults()
+    if fault:
+        return fault
+    security_id = request.query_params.get("securityId")
+    return JSONResponse({
+        "code": 0,
+        "message": "Success",
+        "zpData": {
+            "showGreeting": True,
+            "securityId": security_id,
+            "bossSource": 0,
+            "source": "",
+            "encBossId": f"enc-{security_id}",
+        },
+    })
+
+
+async def fake_config(request: Request) -> JSONResponse:
+    """GET 查看、POST 修改模拟服务器配置"""
+    if request.method == "POST":
+        updates = await request.json()
+        names = {f.name: f.type for f in fields(FakeServerConfig)}
+        for key, value in updates.items():
+            if key in names:
+                setattr(config, key, type(getattr(config, key))(value))
+    return JSONResponse(asdict(config))
+
+
+app = Starlette(routes=[
+    Route("/wapi/zppassport/captcha/randkey", randkey, methods=["GET", "POST"]),
+    Route("/wapi/zpweixin/qrcode/getqrcode", getqrcode),
+    Route("/wapi/zppassport/qrcode/scan", scan),
+    Route("/wapi/zppassport/qrcode/scanLogin", scan_login),
+    Route("/wapi/zppassport/qrcode/dispatcher", dispatcher),
+    Route("/web/common/security-check.html", security_check),
+    Route("/wapi/zpuser/wap/getUserInfo.json", user_info),
+    Route("/wapi/zpgeek/pc/recommend/job/list.json", job_list),
+    Route("/wapi/zpgeek/friend/add.json", friend_add),
+    Route("/__fake__/config", fake_config, methods=["GET", "POST"]),
+])
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 18000) -> uvicorn.Server:
+    """在后台线程中启动模拟服务器，返回 uvicorn.Server 以便调用方停止"""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def config_args(**overrides) -> list:
+    """把配置项转换为命令行参数"""
+    args = []
+    for key, value in overrides.items():
+        args += [f"--{key.replace('_', '-')}", str(value)]
+    return args
+
+
+def start_subprocess(port: int = 18000, latency: float = None, **overrides) -> subprocess.Popen:
+    """在独立进程中启动模拟服务器，避免与被测服务争用GIL"""
+    if latency is not None:
+        overrides["latency"] = latency
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--port", str(port)] + config_args(**overrides),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"模拟服务器启动失败，端口 {port}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Boss直聘接口本地模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    for f in fields(FakeServerConfig):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default)
+    args = parser.parse_args()
+
+    for f in fields(FakeServerConfig):
+        setattr(config, f.name, getattr(args, f.name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -5,40 +5,229 @@ Boss直聘 FastMCP 服务器
 """
 
 import asyncio
+import atexit
+import contextvars
 import json
+import logging
+import logging.handlers
+import math
 import os
+import queue
+import random
+import socket
+import sys
 import time
 import base64
+import hashlib
+import html
+import importlib.util
+import re
+import sqlite3
 import threading
-from dataclasses import dataclass, asdict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, asdict, field
 from typing import Any, Dict, List, Optional, Union
 from pathlib import Path
+from urllib.parse import urljoin, urlparse
 
-import requests
+import httpx
 from fastmcp import FastMCP, Context
 from fastmcp.server.dependencies import get_http_request
 from starlette.requests import Request
-from starlette.responses import JSONResponse, FileResponse
-from starlette.staticfiles import StaticFiles
+from starlette.responses import JSONResponse, FileResponse, PlainTextResponse, Response
 
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad
-from Crypto.Random import get_random_bytes
+# Crypto（会话加密、设备指纹）和 playwright（安全验证）只在登录相关流程中用到，
+# 在首次使用时才导入，只列出工具或读取配置的客户端不必为它们付出启动时间
 
-from playwright.async_api import async_playwright
+try:
+    import h2  # noqa: F401  安装了 h2 时启用 HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import orjson  # 安装了 orjson 时使用更快的 JSON 序列化
+except ImportError:
+    orjson = None
+
+
+# 上游地址，可通过环境变量指向本地模拟服务器做测试/压测
+ZHIPIN_BASE_URL = os.environ.get("BOSS_ZP_BASE_URL", "https://www.zhipin.com").rstrip("/")
+
+# 安全验证时写入浏览器的 Cookie 域
+_base_host = urlparse(ZHIPIN_BASE_URL).hostname or "www.zhipin.com"
+COOKIE_DOMAIN = ".zhipin.com" if _base_host.endswith("zhipin.com") else _base_host
+
+
+def cookie_domain_matches(host: str, domain: str = COOKIE_DOMAIN) -> bool:
+    """按浏览器的规则判断 host 是否属于 Cookie 域：以点开头的域匹配自身及子域名，否则只匹配同一主机"""
+    host, domain = host.lower(), domain.lower()
+    if domain.startswith("."):
+        return host == domain[1:] or host.endswith(domain)
+    return host == domain
+
+
+# Cookie 在会话内以 {名称: 值} 的形式保存，只在写请求头、持久化和返回结果时拼成字符串
+def cookies_from_response(resp: httpx.Response) -> Dict[str, str]:
+    """逐条解析响应的 Set-Cookie 头（不能按逗号拆分，Expires 日期中带逗号）"""
+    cookies = {}
+    for header in resp.headers.get_list("set-cookie"):
+        name, sep, value = header.split(";", 1)[0].partition("=")
+        if sep and name.strip():
+            cookies[name.strip()] = value.strip()
+    return cookies
+
+
+def parse_cookie_header(cookie: Optional[str]) -> Dict[str, str]:
+    """把 "a=1; b=2" 形式的 Cookie 字符串解析为字典"""
+    cookies = {}
+    for cookie_pair in (cookie or "").split(";"):
+        name, sep, value = cookie_pair.strip().partition("=")
+        if sep and name:
+            cookies[name] = value
+    return cookies
+
+
+def format_cookie_header(cookies: Dict[str, str]) -> str:
+    """把 Cookie 字典拼成请求头使用的字符串"""
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.zhipin.com/web/user/?ka=header-login',
+    'Origin': 'https://www.zhipin.com'
+}
+
+
+# 日志：带账号/二维码上下文字段，经队列由后台线程输出，请求路径上只做入队
+LOG_LEVEL = os.environ.get("BOSS_ZP_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("BOSS_ZP_LOG_FORMAT", "text")  # text 或 json
+# 扫码/确认长轮询每多少次记录一次日志
+LOG_POLL_SAMPLE = max(1, int(os.environ.get("BOSS_ZP_LOG_POLL_SAMPLE", "10")))
+
+# 会附加到日志中的上下文字段，可通过 log_context() 或 extra= 传入
+LOG_CONTEXT_FIELDS = ("account_id", "qr_id")
+_log_context: contextvars.ContextVar = contextvars.ContextVar("boss_zp_log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """在当前协程（及其创建的任务）内为日志附加上下文字段"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def log_sampled(count: int) -> bool:
+    """轮询类日志采样：第 1 次以及之后每 LOG_POLL_SAMPLE 次记录一次"""
+    return count % LOG_POLL_SAMPLE == 1 or LOG_POLL_SAMPLE == 1
+
+
+class _ContextFilter(logging.Filter):
+    """在入队前（调用方的上下文中）收集上下文字段"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = dict(_log_context.get())
+        for name in LOG_CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                context[name] = value
+        record.context = context
+        return True
+
+
+class _StructuredFormatter(logging.Formatter):
+    """text：时间 级别 模块 消息 key=value；json：每行一个 JSON 对象"""
+
+    def __init__(self, as_json: bool = False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = getattr(record, "context", {})
+        if self.as_json:
+            return json.dumps({
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **context
+            }, ensure_ascii=False)
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if context:
+            line += " " + " ".join(f"{key}={value}" for key, value in context.items())
+        return line
+
+
+def _setup_logging() -> logging.Logger:
+    logger = logging.getLogger("boss_zp")
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    if not logger.handlers:
+        log_queue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        handler.addFilter(_ContextFilter())
+        # 输出到标准错误，stdio 传输时标准输出留给 MCP 协议
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(_StructuredFormatter(LOG_FORMAT == "json"))
+        listener = logging.handlers.QueueListener(log_queue, output)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(handler)
+    return logger
+
+
+_setup_logging()
+session_log = logging.getLogger("boss_zp.session")
+browser_log = logging.getLogger("boss_zp.browser")
+login_log = logging.getLogger("boss_zp.login")
+security_log = logging.getLogger("boss_zp.security_check")
+index_log = logging.getLogger("boss_zp.job_index")
+greeting_log = logging.getLogger("boss_zp.greeting")
+upstream_log = logging.getLogger("boss_zp.upstream")
 
 
 # 数据模型定义
 @dataclass
 class LoginStatus:
-    """登录状态数据模型"""
+    """登录状态数据模型；Cookie 只保存解析后的字典，请求头字符串由它派生"""
     is_logged_in: bool = False
-    cookie: Optional[str] = None
     bst: Optional[str] = None
     qr_id: Optional[str] = None
-    login_step: str = "idle"  # idle, qr_generated, scanned, confirmed, security_check, logged_in
+    login_step: str = "idle"  # idle, qr_generated, scanned, confirmed, queued, security_check, logged_in, expired, failed
     image_url: Optional[str] = None
     error_message: Optional[str] = None
+    # 排队等待安全验证时的位置（从 1 开始）和预计等待秒数，不在排队时为 None
+    queue_position: Optional[int] = None
+    expected_wait_seconds: Optional[float] = None
+    cookies: Dict[str, str] = field(default_factory=dict)
+    version: int = 0  # 每次状态更新加一，调用方可据此判断状态是否变化
+
+    @property
+    def cookie(self) -> Optional[str]:
+        """请求头使用的 Cookie 字符串，每次由 cookies 拼成"""
+        return format_cookie_header(self.cookies) or None
+
+
+# 登录阶段允许的转换；生成新二维码（qr_generated）总是开始新一轮登录，不在此表中
+LOGIN_TRANSITIONS = {
+    "idle": {"logged_in"},  # 从本地存储恢复
+    "qr_generated": {"scanned", "confirmed", "logged_in", "expired", "failed"},
+    "scanned": {"confirmed", "logged_in", "expired", "failed"},
+    "confirmed": {"queued", "security_check", "logged_in", "expired", "failed"},
+    "queued": {"security_check", "logged_in", "expired", "failed"},  # 等待安全验证名额
+    "security_check": {"logged_in", "expired", "failed"},
+    "logged_in": set(),
+    "expired": set(),
+    "failed": set(),  # 登录监控出错，需要重新生成二维码
+}
+
+# 没有登录流程在进行中的阶段
+LOGIN_SETTLED_STEPS = ("idle", "logged_in", "expired", "failed")
 
 
 @dataclass
@@ -50,249 +239,2870 @@ class JobSearchConfig:
     default_params: Dict[str, Any]
 
 
-@dataclass
-class JobInfo:
-    """职位信息数据模型"""
-    job_id: str
-    title: str
-    company: str
-    salary: str
-    location: str
-    experience: str
-    education: str
-    security_id: Optional[str] = None
+@dataclass(slots=True)
+class JobInfo:
+    """职位信息数据模型（slots 存储，大批量职位时占用更少内存）"""
+    job_id: str = ""
+    title: Optional[str] = None
+    company: Optional[str] = None
+    salary: Optional[str] = None
+    location: Optional[str] = None
+    experience: Optional[str] = None
+    education: Optional[str] = None
+    security_id: Optional[str] = None
+    encrypt_boss_id: Optional[str] = None
+    lid: Optional[str] = None
+    job_labels: List[str] = field(default_factory=list)
+    skills: List[str] = field(default_factory=list)
+    area_district: Optional[str] = None
+    encrypt_brand_id: Optional[str] = None
+    brand_scale_name: Optional[str] = None
+    industry: Optional[str] = None
+    contact: bool = False
+    show_top_position: bool = False
+
+    @classmethod
+    def from_api(cls, job: Dict[str, Any]) -> "JobInfo":
+        """从 recommend/job/list.json 返回的单条职位构建"""
+        return cls(
+            job_id=job.get("encryptJobId") or "",
+            title=job.get("jobName"),
+            company=job.get("brandName"),
+            salary=job.get("salaryDesc"),
+            location=job.get("cityName"),
+            experience=job.get("jobExperience"),
+            education=job.get("jobDegree"),
+            security_id=job.get("securityId"),
+            encrypt_boss_id=job.get("encryptBossId"),
+            lid=job.get("lid"),
+            job_labels=job.get("jobLabels", []),
+            skills=job.get("skills", []),
+            area_district=job.get("areaDistrict"),
+            encrypt_brand_id=job.get("encryptBrandId"),
+            brand_scale_name=job.get("brandScaleName"),
+            industry=job.get("industry"),
+            contact=job.get("contact", False),
+            show_top_position=job.get("showTopPosition", False)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为工具返回的职位格式（与 Boss直聘 接口字段名一致）"""
+        return {
+            "securityId": self.security_id,
+            "encryptBossId": self.encrypt_boss_id,
+            "jobDegree": self.education,
+            "jobName": self.title,
+            "lid": self.lid,
+            "salaryDesc": self.salary,
+            "jobLabels": self.job_labels,
+            "skills": self.skills,
+            "jobExperience": self.experience,
+            "cityName": self.location,
+            "areaDistrict": self.area_district,
+            "encryptBrandId": self.encrypt_brand_id,
+            "brandName": self.company,
+            "brandScaleName": self.brand_scale_name,
+            "industry": self.industry,
+            "contact": self.contact,
+            "showTopPosition": self.show_top_position
+        }
+
+
+@dataclass
+class GreetingRequest:
+    """打招呼请求数据模型"""
+    security_id: str
+    job_id: str
+    message: str = "您好，我对这个职位很感兴趣，希望可以进一步沟通"
+
+
+def _json_default(obj):
+    if isinstance(obj, JobInfo):
+        return obj.to_dict()
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def dumps_json(data: Any, pretty: bool = False) -> str:
+    """序列化工具返回结果：默认紧凑格式，pretty=True 时缩进输出；安装了 orjson 时优先使用"""
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATACLASS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, default=_json_default, option=option).decode("utf-8")
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2, default=_json_default)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+# 运行指标（Prometheus 文本格式）
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, le: str = None) -> str:
+    pairs = list(zip(names, values))
+    if le is not None:
+        pairs.append(("le", le))
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """累积分桶直方图，记录耗时分布"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., 总和, 次数]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, f'{bound:g}')} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, '+Inf')} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """在抓取时通过回调读取当前值的指标"""
+
+    def __init__(self, name: str, help_text: str, callback, metric_type: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def collect(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {float(self.callback()):g}"
+        ]
+
+
+class MetricsRegistry:
+    """指标注册表，按注册顺序输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+UPSTREAM_LATENCY = metrics.register(Histogram(
+    "boss_zp_upstream_request_seconds",
+    "上游接口响应耗时（收到响应头为止）",
+    labelnames=("endpoint", "method"),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+))
+UPSTREAM_RESPONSES = metrics.register(Counter(
+    "boss_zp_upstream_responses_total",
+    "上游接口响应次数",
+    labelnames=("endpoint", "status")
+))
+SECURITY_CHECK_SECONDS = metrics.register(Histogram(
+    "boss_zp_security_check_seconds",
+    "安全验证耗时，engine 为 js（嵌入式 JS 引擎）或 browser（无头浏览器）",
+    labelnames=("result", "engine"),
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+))
+CIRCUIT_OPENED = metrics.register(Counter(
+    "boss_zp_upstream_circuit_opened_total",
+    "账号上游请求熔断次数"
+))
+LOGIN_STAGE_SECONDS = metrics.register(Histogram(
+    "boss_zp_login_stage_seconds",
+    "登录各阶段耗时，stage=total 为生成二维码到登录成功",
+    labelnames=("stage",),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+))
+
+
+async def _record_request_start(request: httpx.Request):
+    request.extensions["boss_zp_start"] = time.perf_counter()
+
+
+async def _record_response(response: httpx.Response):
+    start = response.request.extensions.get("boss_zp_start")
+    if start is None:
+        return
+    endpoint = response.request.url.path
+    UPSTREAM_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, method=response.request.method)
+    UPSTREAM_RESPONSES.inc(endpoint=endpoint, status=str(response.status_code))
+
+
+# 多副本共享状态：登录状态快照、二维码图片、加密的会话和登录监控租约
+class StateBackendError(Exception):
+    """共享状态后端不可用"""
+
+
+class StateBackend:
+    """共享状态后端：带过期时间的键值存储和租约，所有操作都是同步的短操作
+
+    事件循环上不直接调用这些操作：需要结果时 await run(...)，只写不等结果时 submit(...)，
+    两者都在同一个后端线程上按提交顺序执行
+    """
+
+    # 为 False 时只在本进程内有效，调用方可以跳过同步
+    shared = True
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-backend")
+        return self._executor
+
+    async def run(self, func, *args):
+        """在后端线程上执行 func(*args) 并等待结果；进程内后端没有 IO，直接执行"""
+        if not self.shared:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+
+    def submit(self, func, *args, error: str, extra: Dict[str, Any] = None):
+        """把写操作排入后端线程，不等待结果；后端不可用时以 error 为前缀记录日志"""
+        def log_failure(future):
+            if future.exception() is not None:
+                session_log.warning("%s: %s", error, future.exception(), extra=extra)
+
+        if not self.shared:
+            try:
+                func(*args)
+            except StateBackendError as e:
+                session_log.warning("%s: %s", error, e, extra=extra)
+            return
+        self._get_executor().submit(func, *args).add_done_callback(log_failure)
+
+    def flush(self):
+        """等待已排队的操作执行完，关闭后端线程"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def keys(self, prefix: str) -> List[str]:
+        """列出以 prefix 开头且未过期的键"""
+        raise NotImplementedError
+
+    def acquire(self, key: str, owner: str, ttl: float, force: bool = False) -> bool:
+        """获取或续期租约：租约空闲、已过期或本来就属于 owner 时成功；force=True 时直接抢占"""
+        raise NotImplementedError
+
+    def release(self, key: str, owner: str):
+        """释放 owner 持有的租约"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """进程内后端（默认），单副本部署时不引入任何额外开销"""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key: str, now: float) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._alive(key, time.time())
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self, prefix: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [key for key in list(self._data) if key.startswith(prefix) and self._alive(key, now) is not None]
+
+    def acquire(self, key: str, owner: str, ttl: float, force: bool = False) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._alive(key, now)
+            if not force and current is not None and current != owner.encode("utf-8"):
+                return False
+            self._data[key] = (owner.encode("utf-8"), now + ttl)
+            return True
+
+    def release(self, key: str, owner: str):
+        with self._lock:
+            if self._alive(key, time.time()) == owner.encode("utf-8"):
+                del self._data[key]
+
+
+class SQLiteStateBackend(StateBackend):
+    """SQLite 后端：同一台主机上的多个副本共享一个数据库文件，依靠 SQLite 的文件锁保证租约原子性"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库（调用方需持有锁）"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            self._conn = conn
+        return self._conn
+
+    def _run(self, func):
+        with self._lock:
+            try:
+                return func(self._connect())
+            except sqlite3.Error as e:
+                raise StateBackendError(f"SQLite 共享状态不可用: {e}") from e
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._run(lambda conn: conn.execute(
+            "SELECT value FROM state WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone())
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        expires = time.time() + ttl if ttl else None
+        self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)", (key, value, expires)
+        ))
+
+    def delete(self, key: str):
+        self._run(lambda conn: conn.execute("DELETE FROM state WHERE key = ?", (key,)))
+
+    def keys(self, prefix: str) -> List[str]:
+        rows = self._run(lambda conn: conn.execute(
+            "SELECT key FROM state WHERE substr(key, 1, ?) = ? AND (expires IS NULL OR expires > ?)",
+            (len(prefix), prefix, time.time())
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def acquire(self, key: str, owner: str, ttl: float, force: bool = False) -> bool:
+        def acquire(conn: sqlite3.Connection) -> bool:
+            now = time.time()
+            # BEGIN IMMEDIATE 先拿到写锁，读取和写入之间其他进程无法插入
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value, expires FROM state WHERE key = ?", (key,)).fetchone()
+                if not force and row and row[1] > now and row[0] != owner.encode("utf-8"):
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)",
+                    (key, owner.encode("utf-8"), now + ttl)
+                )
+                return True
+            finally:
+                conn.execute("COMMIT")
+        return self._run(acquire)
+
+    def release(self, key: str, owner: str):
+        self._run(lambda conn: conn.execute("DELETE FROM state WHERE key = ? AND value = ?", (key, owner.encode("utf-8"))))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+REDIS_CLIENT_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+
+class RedisStateBackend(StateBackend):
+    """Redis 后端：跨主机共享，用到 GET/SET/DEL/SCAN 和 EVAL，兼容 Redis 及支持 Lua 脚本的替代实现
+
+    安装了 redis-py（可选依赖）时用它收发命令，否则使用内置的最小 RESP 客户端。
+    获取租约用 SET NX PX，续期和释放在 Lua 脚本中比较持有者后再 PEXPIRE/DEL，都是原子的
+    """
+
+    RENEW_SCRIPT = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('PEXPIRE', KEYS[1], ARGV[2]) end return 0"
+    RELEASE_SCRIPT = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._redis = None
+        if REDIS_CLIENT_AVAILABLE:
+            import redis
+
+            # 固定使用 RESP2：不要求服务端支持 HELLO，返回值形状也与内置客户端一致
+            self._redis = redis.Redis.from_url(url, protocol=2, socket_timeout=timeout, socket_connect_timeout=timeout)
+            self._redis_error = redis.RedisError
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._reader = sock, sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("连接已关闭")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise StateBackendError(f"Redis 错误: {body.decode('utf-8', 'replace')}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise StateBackendError(f"无法解析的 Redis 响应: {line!r}")
+
+    def command(self, *args):
+        """执行一条命令，连接断开时重连重试一次"""
+        if self._redis is not None:
+            try:
+                return self._redis.execute_command(*args)
+            except self._redis_error as e:
+                raise StateBackendError(f"Redis 共享状态不可用: {e}") from e
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError) as e:
+                    self._disconnect()
+                    if attempt:
+                        raise StateBackendError(f"Redis 共享状态不可用: {e}") from e
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float = None):
+        if ttl:
+            self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key: str):
+        self.command("DEL", key)
+
+    def keys(self, prefix: str) -> List[str]:
+        cursor, keys = 0, []
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        while True:
+            # redis-py 返回整数游标，内置客户端返回字节串
+            cursor, batch = self.command("SCAN", cursor, "MATCH", pattern, "COUNT", 100)
+            keys.extend(key.decode("utf-8") for key in batch)
+            cursor = int(cursor)
+            if cursor == 0:
+                return keys
+
+    def acquire(self, key: str, owner: str, ttl: float, force: bool = False) -> bool:
+        ttl_ms = int(ttl * 1000)
+        if force:
+            self.command("SET", key, owner, "PX", ttl_ms)
+            return True
+        # SET NX 成功时 redis-py 返回 True，内置客户端返回 "OK"，已被占用时都返回 None
+        if self.command("SET", key, owner, "NX", "PX", ttl_ms):
+            return True
+        return self.command("EVAL", self.RENEW_SCRIPT, 1, key, owner, ttl_ms) == 1
+
+    def release(self, key: str, owner: str):
+        self.command("EVAL", self.RELEASE_SCRIPT, 1, key, owner)
+
+    def close(self):
+        if self._redis is not None:
+            self._redis.close()
+        with self._lock:
+            self._disconnect()
+
+
+def create_state_backend(url: str) -> StateBackend:
+    """按 BOSS_ZP_STATE_BACKEND 创建后端：memory（默认）、sqlite:///路径、redis://主机:端口/库"""
+    if not url or url == "memory":
+        return MemoryStateBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://"):
+        return RedisStateBackend(url)
+    raise ValueError(f"不支持的共享状态后端: {url}")
+
+
+shared_state = create_state_backend(os.environ.get("BOSS_ZP_STATE_BACKEND", "memory"))
+# 本副本的标识，用作登录监控租约的持有者
+REPLICA_ID = os.environ.get("BOSS_ZP_REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# 登录状态快照在共享后端中的保留时间
+SHARED_LOGIN_TTL = 24 * 3600
+
+
+# 账号会话
+class AccountSession:
+    """单个账号的会话：登录状态、Cookie 和连接池"""
+
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.login_status = LoginStatus()
+        self.client = None
+        self.last_used = time.monotonic()
+        # 从本地存储恢复、尚未校验有效性的会话，以及首次使用时的恢复任务
+        self.restored = False
+        self.restoring: Optional[asyncio.Task] = None
+        # 登录代数：每次生成二维码或重置登录时加一，旧一轮的监控据此识别自己已过期
+        self.login_generation = 0
+        # 当前二维码的过期时间（墙钟时间，供其他副本判断能否接管），以及已有登录监控的登录代数
+        self.qr_expires_at = None
+        self.watched_generation = None
+        # 登录阶段计时：本次登录开始时间、上一次阶段变化时间
+        self._login_started = None
+        self._step_changed = None
+        # 登录阶段变化时触发，随后换成新的 Event，等待方据此得到推送而不必轮询
+        self._step_event = asyncio.Event()
+
+    def touch(self):
+        """记录最近一次使用时间，用于 LRU 淘汰"""
+        self.last_used = time.monotonic()
+
+    @property
+    def is_busy(self) -> bool:
+        """登录流程进行中的会话不能被淘汰"""
+        return self.login_status.login_step not in LOGIN_SETTLED_STEPS
+
+    def get_client(self) -> httpx.AsyncClient:
+        """获取或创建异步HTTP客户端（连接池 + keep-alive，可用时启用HTTP/2，经过统一限流）"""
+        if self.client is None:
+            hooks = upstream_guard.event_hooks(self.account_id)
+            self.client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=httpx.Timeout(10.0),
+                transport=upstream_guard.transport(
+                    self.account_id,
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(
+                        max_connections=20,
+                        max_keepalive_connections=5,
+                        keepalive_expiry=30.0
+                    )
+                ),
+                event_hooks={
+                    "request": hooks["request"] + [_record_request_start],
+                    "response": [_record_response] + hooks["response"]
+                }
+            )
+        return self.client
+
+    def is_current(self, generation: int) -> bool:
+        """generation 是否仍是该账号当前这一轮登录"""
+        return generation == self.login_generation
+
+    async def begin_login(self, qr_id: str, issued_at: float = None) -> int:
+        """生成新二维码，开始新一轮登录，返回本轮的登录代数
+
+        issued_at 为二维码的申请时间（time.time()），预申请的二维码从申请时起算有效期，默认是现在
+        """
+        # 先同步其他副本的登录代数，保证新的一轮比所有副本上的都新
+        await self.refresh_shared()
+        self.login_generation += 1
+        self.qr_expires_at = (issued_at or time.time()) + login_watcher.qr_ttl
+        self._record_step("qr_generated")
+        self._apply(
+            qr_id=qr_id, login_step="qr_generated", image_url=None, error_message=None,
+            queue_position=None, expected_wait_seconds=None
+        )
+        self._notify_step()
+        return self.login_generation
+
+    def update_login_status(self, generation: int = None, **kwargs) -> bool:
+        """更新登录状态
+
+        检查和写入之间没有 await，在事件循环上是原子的。传入 generation 时只有仍是同一轮登录才会写入，
+        阶段变化不在 LOGIN_TRANSITIONS 中时拒绝写入；被拒绝时返回 False。
+        这里不读取共享后端：其他副本开始的新一轮登录由监控续期租约时发现，本副本过期的快照也不会覆盖更新的快照
+        """
+        if generation is not None and not self.is_current(generation):
+            login_log.info("忽略过期登录流程的状态更新: %s", kwargs, extra={"account_id": self.account_id})
+            return False
+        current = self.login_status.login_step
+        step = kwargs.get("login_step")
+        changed = bool(step) and step != current
+        if changed and step not in LOGIN_TRANSITIONS.get(current, ()):
+            login_log.warning("非法的登录状态转换: %s -> %s", current, step, extra={"account_id": self.account_id})
+            return False
+        # 排队位置前移时阶段不变，也要唤醒等待者推送新的位置
+        moved = "queue_position" in kwargs and kwargs["queue_position"] != self.login_status.queue_position
+        if changed:
+            self._record_step(step)
+        self._apply(**kwargs)
+        if changed or moved:
+            self._notify_step()
+        return True
+
+    def _apply(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self.login_status, key):
+                setattr(self.login_status, key, value)
+        self.login_status.version += 1
+        self.publish_shared()
+
+    def publish_shared(self):
+        """把登录状态快照写入共享后端；快照不含 Cookie，Cookie 由 SessionStore 加密保存"""
+        if not shared_state.shared:
+            return
+        status = self.login_status
+        snapshot = {
+            "generation": self.login_generation,
+            "version": status.version,
+            "is_logged_in": status.is_logged_in,
+            "qr_id": status.qr_id,
+            "login_step": status.login_step,
+            "image_url": status.image_url,
+            "error_message": status.error_message,
+            "queue_position": status.queue_position,
+            "expected_wait_seconds": status.expected_wait_seconds,
+            "qr_expires_at": self.qr_expires_at,
+            "watched": self.watched_generation == self.login_generation,
+            "replica": REPLICA_ID
+        }
+        shared_state.submit(
+            self._write_snapshot, f"login:{self.account_id}", snapshot,
+            error="写入共享登录状态失败", extra={"account_id": self.account_id}
+        )
+
+    @staticmethod
+    def _write_snapshot(key: str, snapshot: Dict[str, Any]):
+        """在后端线程上写入快照；后端中已有更新的快照（其他副本开始了新一轮登录）时不覆盖"""
+        data = shared_state.get(key)
+        if data is not None:
+            current = json.loads(data)
+            if (current["generation"], current["version"]) > (snapshot["generation"], snapshot["version"]):
+                return
+        shared_state.set(key, json.dumps(snapshot).encode("utf-8"), ttl=SHARED_LOGIN_TTL)
+
+    def _is_newer(self, snapshot: Dict[str, Any]) -> bool:
+        return (snapshot["generation"], snapshot["version"]) > (self.login_generation, self.login_status.version)
+
+    async def refresh_shared(self):
+        """其他副本写入了更新的登录状态（登录代数、版本号更大）时，以共享后端中的快照为准"""
+        if not shared_state.shared:
+            return
+        try:
+            data = await shared_state.run(shared_state.get, f"login:{self.account_id}")
+        except StateBackendError as e:
+            session_log.warning("读取共享登录状态失败: %s", e, extra={"account_id": self.account_id})
+            return
+        if data is None:
+            return
+        snapshot = json.loads(data)
+        if not self._is_newer(snapshot):
+            return
+        record = None
+        if snapshot["is_logged_in"] and not self.login_status.is_logged_in:
+            try:
+                record = await shared_state.run(state.store.load, self.account_id)
+            except StateBackendError:
+                return
+            if not record or not record.get("cookie"):
+                # 对方副本还没写完 Cookie，下次再同步
+                return
+        self._merge_shared(snapshot, record)
+
+    def _merge_shared(self, snapshot: Dict[str, Any], record: Optional[Dict[str, Any]]):
+        """合并共享快照；读取期间本地状态可能已经更新，这里再比较一次（之后没有 await）"""
+        status = self.login_status
+        if not self._is_newer(snapshot):
+            return
+
+        if snapshot["is_logged_in"]:
+            if not status.is_logged_in:
+                if record is None:
+                    return
+                status.cookies = parse_cookie_header(record["cookie"])
+                status.bst = record.get("bst")
+        else:
+            status.cookies, status.bst = {}, None
+        for key in ("is_logged_in", "qr_id", "login_step", "image_url", "error_message", "version"):
+            setattr(status, key, snapshot[key])
+        status.queue_position = snapshot.get("queue_position")
+        status.expected_wait_seconds = snapshot.get("expected_wait_seconds")
+        self.login_generation = snapshot["generation"]
+        self.qr_expires_at = snapshot["qr_expires_at"]
+        self.restored = False
+        self._login_started = self._step_changed = None
+        self._notify_step()
+
+    def _notify_step(self):
+        event, self._step_event = self._step_event, asyncio.Event()
+        event.set()
+
+    @property
+    def step_event(self) -> asyncio.Event:
+        """下一次登录阶段（或排队位置）变化时触发的事件；先取事件再读阶段，两者之间的变化也不会错过"""
+        return self._step_event
+
+    async def wait_for_step_change(self, event: asyncio.Event, timeout: float) -> bool:
+        """等待 event（此前取得的 step_event）触发，超时返回 False"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _record_step(self, step: str):
+        """记录登录阶段耗时，从生成二维码开始计时"""
+        now = time.monotonic()
+        if step == "qr_generated":
+            self._login_started = now
+        elif self._step_changed is not None:
+            LOGIN_STAGE_SECONDS.observe(now - self._step_changed, stage=f"{self.login_status.login_step}->{step}")
+        if step == "logged_in" and self._login_started is not None:
+            LOGIN_STAGE_SECONDS.observe(now - self._login_started, stage="total")
+            self._login_started = None
+        self._step_changed = now if self._login_started is not None else None
+
+    async def reset_login(self):
+        """重置登录状态，并取消该账号尚未结束的登录监控"""
+        login_watcher.cancel(self.account_id)
+        job_cache.invalidate(lambda key: key[0] == self.account_id)
+        await self.refresh_shared()
+        # 换成新的状态对象，版本号继续递增；代数加一后旧一轮的监控（包括其他副本上的）无法再写入
+        self.login_generation += 1
+        self.login_status = LoginStatus(version=self.login_status.version + 1)
+        self.qr_expires_at = None
+        self._login_started = self._step_changed = None
+        self.publish_shared()
+        self._notify_step()
+        if self.client:
+            # 保留连接池，只清掉上一次登录的身份信息
+            self.client.cookies.clear()
+            for key in ('Cookie', 'zp_token'):
+                self.client.headers.pop(key, None)
+
+    async def close(self):
+        """关闭该账号持有的连接"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+
+# 本地会话存储
+class SessionStore:
+    """加密会话存储：AES-GCM 加密，按需加载
+
+    默认每个账号一个本地文件，原子写入；配置了共享后端时密文写入后端，各副本共用
+    （各副本需通过 BOSS_ZP_STORE_KEY 使用同一个密钥）
+    """
+
+    KEY_ENV = "BOSS_ZP_STORE_KEY"
+
+    def __init__(self, directory: str = None, backend: StateBackend = None):
+        self.directory = Path(directory or os.environ.get("BOSS_ZP_STORE_DIR", "data/sessions"))
+        self.backend = backend
+        self._key = None
+
+    def _get_key(self) -> bytes:
+        """读取加密密钥：优先使用环境变量，否则使用（或生成）存储目录下的密钥文件"""
+        if self._key is None:
+            env_key = os.environ.get(self.KEY_ENV)
+            if env_key:
+                self._key = base64.b64decode(env_key)
+            else:
+                key_file = self.directory / ".store_key"
+                if key_file.exists():
+                    self._key = key_file.read_bytes()
+                else:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    self._key = os.urandom(32)
+                    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(self._key)
+        return self._key
+
+    def _path(self, account_id: str) -> Path:
+        name = base64.urlsafe_b64encode(account_id.encode("utf-8")).decode("ascii").rstrip("=")
+        return self.directory / f"{name}.session"
+
+    def account_ids(self) -> List[str]:
+        """列出已持久化的账号ID（不解密）"""
+        if self.backend is not None:
+            return [key[len("session:"):] for key in self.backend.keys("session:")]
+        if not self.directory.exists():
+            return []
+        ids = []
+        for path in self.directory.glob("*.session"):
+            name = path.stem
+            ids.append(base64.urlsafe_b64decode(name + "=" * (-len(name) % 4)).decode("utf-8"))
+        return ids
+
+    def save(self, account_id: str, login_status: LoginStatus):
+        """加密并原子写入账号的 Cookie 和 bst"""
+        payload = json.dumps({
+            "account_id": account_id,
+            "cookie": login_status.cookie,
+            "bst": login_status.bst,
+            "saved_at": int(time.time())
+        }).encode("utf-8")
+
+        from Crypto.Cipher import AES
+
+        nonce = os.urandom(12)
+        cipher = AES.new(self._get_key(), AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(payload)
+
+        if self.backend is not None:
+            self.backend.set(f"session:{account_id}", nonce + tag + ciphertext)
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(account_id)
+        tmp_path = path.with_suffix(".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(nonce + tag + ciphertext)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, account_id: str) -> Optional[Dict[str, Any]]:
+        """读取并解密账号会话，不存在或无法解密时返回 None"""
+        if self.backend is not None:
+            data = self.backend.get(f"session:{account_id}")
+        else:
+            path = self._path(account_id)
+            data = path.read_bytes() if path.exists() else None
+        if data is None:
+            return None
+        from Crypto.Cipher import AES
+
+        try:
+            cipher = AES.new(self._get_key(), AES.MODE_GCM, nonce=data[:12])
+            payload = cipher.decrypt_and_verify(data[28:], data[12:28])
+            return json.loads(payload)
+        except (ValueError, KeyError) as e:
+            session_log.warning("无法读取会话: %s", e, extra={"account_id": account_id})
+            return None
+
+    def delete(self, account_id: str):
+        """删除账号的持久化会话"""
+        if self.backend is not None:
+            self.backend.delete(f"session:{account_id}")
+            return
+        self._path(account_id).unlink(missing_ok=True)
+
+
+# 全局状态管理
+class BossZhipinState:
+    """Boss直聘全局状态管理：按账号ID管理会话池"""
+
+    DEFAULT_ACCOUNT = "default"
+
+    def __init__(self, max_sessions: int = None, idle_timeout: float = None):
+        # 会话数量上限即内存上限：每个会话持有一个连接池和一份Cookie
+        self.max_sessions = max_sessions or int(os.environ.get("BOSS_ZP_MAX_SESSIONS", "50"))
+        self.idle_timeout = idle_timeout or float(os.environ.get("BOSS_ZP_SESSION_IDLE_TIMEOUT", "3600"))
+        self.accounts: "OrderedDict[str, AccountSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.store = SessionStore(backend=shared_state if shared_state.shared else None)
+        self.static_dir = Path("static")
+
+    async def get_account(self, account_id: str = DEFAULT_ACCOUNT) -> AccountSession:
+        """获取或创建账号会话，并按 LRU 淘汰多余的空闲会话"""
+        account_id = account_id or self.DEFAULT_ACCOUNT
+        with self._lock:
+            account = self.accounts.get(account_id)
+            created = account is None
+            if created:
+                account = AccountSession(account_id)
+                # 恢复期间并发的调用等待同一个恢复任务，不会看到尚未恢复的会话
+                account.restoring = asyncio.get_running_loop().create_task(self._restore(account))
+                self.accounts[account_id] = account
+            self.accounts.move_to_end(account_id)
+            account.touch()
+            evicted = self._evict_locked()
+
+        for old in evicted:
+            session_log.info("淘汰空闲会话", extra={"account_id": old.account_id})
+            self._close_later(old)
+
+        if not account.restoring.done():
+            await asyncio.shield(account.restoring)
+        elif not created:
+            # 多副本部署时登录可能由其他副本推进
+            await account.refresh_shared()
+        return account
+
+    async def _restore(self, account: AccountSession):
+        """从本地存储恢复账号的登录信息，首次使用前再校验有效性；共享后端中已有登录状态时以其为准"""
+        await account.refresh_shared()
+        if account.login_status.version:
+            return
+        try:
+            record = await shared_state.run(self.store.load, account.account_id)
+        except StateBackendError as e:
+            session_log.warning("读取会话失败: %s", e, extra={"account_id": account.account_id})
+            return
+        if not record or not record.get("cookie"):
+            return
+        account.update_login_status(
+            is_logged_in=True,
+            cookies=parse_cookie_header(record["cookie"]),
+            bst=record.get("bst"),
+            login_step="logged_in"
+        )
+        account.restored = True
+        session_log.info("已恢复会话，等待校验", extra={"account_id": account.account_id})
+
+    async def get_ready_account(self, account_id: str = DEFAULT_ACCOUNT) -> AccountSession:
+        """获取账号会话；从本地存储恢复的会话先用一次轻量接口校验Cookie是否仍然有效"""
+        account = await self.get_account(account_id)
+        if not account.restored:
+            return account
+        # 同一账号并发的查询只校验一次
+        return await upstream_flights.do(("ready", account.account_id), lambda: self._validate_restored(account))
+
+    async def _validate_restored(self, account: AccountSession) -> AccountSession:
+        """校验恢复的会话，失效时清除本地存储"""
+        client = account.get_client()
+        BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, account.login_status.bst)
+        valid = await BossZhipinAPI.check_cookie_valid(client)
+        if valid is None:
+            # 网络异常，保留恢复状态，下次使用时再校验
+            return account
+
+        account.restored = False
+        if valid:
+            session_log.info("恢复的会话仍然有效", extra={"account_id": account.account_id})
+        else:
+            session_log.warning("恢复的会话已失效，需要重新登录", extra={"account_id": account.account_id})
+            await account.reset_login()
+            await shared_state.run(self.store.delete, account.account_id)
+        return account
+
+    async def save_account(self, account: AccountSession):
+        """持久化账号的登录信息"""
+        try:
+            await shared_state.run(self.store.save, account.account_id, account.login_status)
+        except (OSError, StateBackendError) as e:
+            session_log.error("保存会话失败: %s", e, extra={"account_id": account.account_id})
+
+    def _evict_locked(self) -> List[AccountSession]:
+        """淘汰超时或超出上限的空闲会话（调用方需持有锁）"""
+        now = time.monotonic()
+        evicted = []
+        for account_id, account in list(self.accounts.items()):
+            if account.is_busy:
+                continue
+            over_limit = len(self.accounts) > self.max_sessions
+            expired = now - account.last_used > self.idle_timeout
+            if not (over_limit or expired):
+                continue
+            # 最近使用的会话位于末尾，刚刚访问的那个永远不会被淘汰
+            if account_id == next(reversed(self.accounts)):
+                break
+            evicted.append(self.accounts.pop(account_id))
+        return evicted
+
+    @staticmethod
+    def _close_later(account: AccountSession):
+        """在事件循环中异步关闭被淘汰会话的连接"""
+        login_watcher.cancel(account.account_id)
+        job_cache.invalidate(lambda key: key[0] == account.account_id)
+        upstream_guard.forget(account.account_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(account.close())
+
+    async def remove_account(self, account_id: str) -> bool:
+        """移除账号会话，同时删除本地持久化的登录信息"""
+        stored = account_id in await shared_state.run(self.store.account_ids)
+        await shared_state.run(self.store.delete, account_id)
+        if shared_state.shared:
+            await shared_state.run(shared_state.delete, f"login:{account_id}")
+        with self._lock:
+            account = self.accounts.pop(account_id, None)
+        if account is None:
+            return stored
+        self._close_later(account)
+        return True
+
+    def list_accounts(self) -> List[Dict[str, Any]]:
+        """列出当前会话池中的账号"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "account_id": account.account_id,
+                    "is_logged_in": account.login_status.is_logged_in,
+                    "login_step": account.login_status.login_step,
+                    "idle_seconds": round(now - account.last_used, 1)
+                }
+                for account in self.accounts.values()
+            ]
+
+
+# 全局状态实例
+state = BossZhipinState()
+
+
+# 浏览器池
+class BrowserPool:
+    """常驻 Chromium 浏览器池：复用浏览器进程，每次安全验证使用独立的新上下文"""
+
+    def __init__(self, max_contexts: int = None, max_uses: int = None):
+        # 同时打开的上下文数量上限，以及单个浏览器进程最多服务的次数（到达后回收重启）
+        self.max_contexts = max_contexts or int(os.environ.get("BOSS_ZP_BROWSER_MAX_CONTEXTS", "4"))
+        self.max_uses = max_uses or int(os.environ.get("BOSS_ZP_BROWSER_MAX_USES", "50"))
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+        self._launches = 0
+        self._active = 0
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_contexts)
+        # 预热模式下常备一个已打开页面的空闲上下文：(browser, context)
+        self.keep_spare = False
+        self._spare = None
+        self._spare_task = None
+
+    async def _acquire_browser(self):
+        """获取当前浏览器，必要时启动或回收（调用方需持有锁）"""
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+
+        if self._browser is not None and (self._uses >= self.max_uses or not self._browser.is_connected()):
+            browser_log.info("浏览器已服务 %d 次，回收重启", self._uses)
+            retired, self._browser = self._browser, None
+            if not retired.contexts:
+                await retired.close()
+
+        if self._browser is None:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._uses = 0
+            self._launches += 1
+            browser_log.info("已启动浏览器（第 %d 次）", self._launches)
+
+        self._uses += 1
+        return self._browser
+
+    async def _release(self, browser, context):
+        await context.close()
+        # 已被回收的浏览器在最后一个上下文关闭后再退出
+        if browser is not self._browser and not browser.contexts:
+            await browser.close()
+
+    async def _new_spare(self):
+        """创建备用上下文，并提前打开一个页面连上安全验证页面所在的站点"""
+        async with self._lock:
+            browser = await self._acquire_browser()
+        context = await browser.new_context()
+        page = await context.new_page()
+        try:
+            await page.goto(f"{ZHIPIN_BASE_URL}/", wait_until="commit")
+        except Exception as e:
+            browser_log.debug("预热页面访问失败: %s", e)
+        return browser, context
+
+    async def _refill_spare(self):
+        try:
+            self._spare = await self._new_spare()
+            browser_log.debug("备用浏览器上下文已就绪")
+        except Exception as e:
+            browser_log.warning("预热浏览器上下文失败: %s", e)
+
+    def enable_spare(self):
+        """开启预热：在后台准备一个备用上下文，每次被借出后自动补充"""
+        self.keep_spare = True
+        if self._spare is None and (self._spare_task is None or self._spare_task.done()):
+            self._spare_task = asyncio.get_running_loop().create_task(self._refill_spare())
+
+    @asynccontextmanager
+    async def context(self):
+        """借出一个全新的隔离浏览器上下文（预热模式下优先使用备用上下文），用完自动关闭"""
+        async with self._semaphore:
+            spare, self._spare = self._spare, None
+            if spare is not None and spare[0] is self._browser and spare[0].is_connected():
+                browser, context = spare
+            else:
+                if spare is not None:
+                    await self._release(*spare)
+                async with self._lock:
+                    browser = await self._acquire_browser()
+                context = await browser.new_context()
+            if self.keep_spare:
+                self.enable_spare()
+            self._active += 1
+            try:
+                yield context
+            finally:
+                self._active -= 1
+                await self._release(browser, context)
+
+    async def warm_up(self):
+        """预先启动浏览器进程"""
+        async with self._lock:
+            if self._browser is None:
+                await self._acquire_browser()
+                self._uses -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """浏览器池运行状态"""
+        return {
+            "running": self._browser is not None,
+            "launches": self._launches,
+            "uses": self._uses,
+            "active_contexts": self._active,
+            "spare_ready": self._spare is not None,
+            "max_contexts": self.max_contexts,
+            "max_uses": self.max_uses
+        }
+
+    async def close(self):
+        """关闭浏览器和 Playwright"""
+        if self._spare_task is not None:
+            self._spare_task.cancel()
+        spare, self._spare = self._spare, None
+        if spare is not None:
+            await spare[1].close()
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+browser_pool = BrowserPool()
+
+
+# 安全验证工作进程池：Playwright 和 Chromium 运行在独立进程中
+def process_tree_rss(pid: int) -> Optional[int]:
+    """进程及其全部子进程（Playwright 驱动、Chromium）的常驻内存字节数，只支持 Linux，其他平台返回 None"""
+    try:
+        entries = os.scandir("/proc")
+    except FileNotFoundError:
+        return None
+    parents, rss = {}, {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    with entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat", "rb") as f:
+                    # 进程名可能带空格和括号，从最后一个 ')' 之后开始取字段
+                    fields = f.read().rsplit(b")", 1)[1].split()
+            except OSError:
+                continue
+            child = int(entry.name)
+            parents.setdefault(int(fields[1]), []).append(child)
+            rss[child] = int(fields[21]) * page_size
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += rss.get(current, 0)
+        pending.extend(parents.get(current, ()))
+    return total
+
+
+class SecurityCheckWorkerPool:
+    """安全验证工作进程池
+
+    每个工作进程运行自己的浏览器池，一次处理一个任务，通过标准输入/输出逐行收发 JSON。
+    任务超时的工作进程连同其浏览器一起结束，内存超过上限的在任务完成后重启，
+    服务进程只负责排队和转发，不受页面卡死或内存暴涨影响
+    """
+
+    WORKER_FLAG = "--security-check-worker"
+
+    def __init__(self, size: int = None, timeout: float = None, queue_timeout: float = None, max_rss_mb: int = None):
+        # 工作进程数，0 表示在服务进程内执行（默认）
+        self.size = size if size is not None else int(os.environ.get("BOSS_ZP_SECURITY_WORKERS", "0"))
+        # 单个任务的执行时限，以及任务最多排队多久
+        self.timeout = timeout or float(os.environ.get("BOSS_ZP_SECURITY_TIMEOUT", "60"))
+        self.queue_timeout = queue_timeout or float(os.environ.get("BOSS_ZP_SECURITY_QUEUE_TIMEOUT", "30"))
+        # 工作进程（含 Chromium）的内存上限
+        self.max_rss = (max_rss_mb or int(os.environ.get("BOSS_ZP_SECURITY_WORKER_MAX_RSS_MB", "1024"))) * 1024 * 1024
+        self._queue: Optional[asyncio.Queue] = None
+        self._loops: List[asyncio.Task] = []
+        self._procs: Dict[int, asyncio.subprocess.Process] = {}
+        self._busy = 0
+        self.jobs = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self):
+        """启动工作进程（在服务器事件循环上调用）"""
+        if not self.enabled or self._loops:
+            return
+        self._queue = asyncio.Queue()
+        self._loops = [self._start_loop(index) for index in range(self.size)]
+        browser_log.info("安全验证工作进程池已启动，进程数 %d", self.size)
+
+    def _start_loop(self, index: int) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._worker_loop(index), name=f"security-worker-{index}")
+        task.add_done_callback(lambda t: self._restart_loop(index, t))
+        return task
+
+    def _restart_loop(self, index: int, task: asyncio.Task):
+        """工作循环意外退出时重新启动，否则排队中的任务没有人处理"""
+        if task.cancelled() or index >= len(self._loops) or self._loops[index] is not task:
+            return
+        browser_log.error("安全验证工作循环 %d 异常退出，重新启动: %r", index, task.exception())
+        self.restarts += 1
+        self._loops[index] = self._start_loop(index)
+
+    async def run(self, cookies: Dict[str, str]) -> tuple[Dict[str, str], str]:
+        """提交一次安全验证并等待结果，返回 (最终 Cookie, 结果)；排队超过 queue_timeout 时抛出 TimeoutError"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        started = asyncio.Event()
+        await self._queue.put((cookies, future, started))
+        try:
+            await asyncio.wait_for(started.wait(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not started.is_set():
+                # 工作进程之后取到已取消的任务时直接跳过
+                future.cancel()
+                raise asyncio.TimeoutError(f"安全验证排队超过 {self.queue_timeout:.0f} 秒") from None
+        # 开始执行后由工作循环按 timeout 限时
+        return await future
+
+    async def _spawn(self, index: int) -> asyncio.subprocess.Process:
+        env = dict(os.environ, BOSS_ZP_SECURITY_WORKERS="0")
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), self.WORKER_FLAG,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            # 独立进程组，结束时连同 Playwright 驱动一起结束
+            start_new_session=os.name == "posix"
+        )
+        self._procs[index] = proc
+        browser_log.info("已启动安全验证工作进程 %d (pid %d)", index, proc.pid)
+        return proc
+
+    def _kill(self, index: int):
+        proc = self._procs.pop(index, None)
+        if proc is None or proc.returncode is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, 9)
+            else:
+                proc.kill()
+        except ProcessLookupError:
+            pass
+
+    def _stop(self, index: int):
+        """关闭标准输入，工作进程关闭浏览器后自行退出"""
+        proc = self._procs.pop(index, None)
+        if proc is not None and proc.returncode is None:
+            proc.stdin.close()
+
+    @staticmethod
+    async def _call(proc: asyncio.subprocess.Process, cookies: Dict[str, str]) -> Dict[str, Any]:
+        proc.stdin.write(json.dumps({"cookies": cookies}).encode("utf-8") + b"\n")
+        await proc.stdin.drain()
+        line = await proc.stdout.readline()
+        if not line:
+            raise ConnectionError(f"工作进程已退出，返回码 {proc.returncode}")
+        return json.loads(line)
+
+    async def _worker_loop(self, index: int):
+        failures, future = 0, None
+        try:
+            while True:
+                proc = self._procs.get(index)
+                if proc is None or proc.returncode is not None:
+                    try:
+                        proc = await self._spawn(index)
+                    except OSError as e:
+                        # 启动失败时退避重试，排队的任务由 run() 按排队时限结束
+                        failures += 1
+                        browser_log.error("启动安全验证工作进程 %d 失败: %s", index, e)
+                        await asyncio.sleep(backoff_delay(failures))
+                        continue
+                    failures = 0
+
+                cookies, future, started = await self._queue.get()
+                if future.done():
+                    continue
+                started.set()
+
+                self._busy += 1
+                self.jobs += 1
+                try:
+                    reply = await asyncio.wait_for(self._call(proc, cookies), timeout=self.timeout)
+                except (asyncio.TimeoutError, ConnectionError, OSError, ValueError) as e:
+                    # 卡死或崩溃的工作进程直接结束，下一轮重新启动
+                    if isinstance(e, asyncio.TimeoutError):
+                        e = asyncio.TimeoutError(f"安全验证超过 {self.timeout:.0f} 秒未完成")
+                    browser_log.warning("安全验证工作进程 %d 异常，重启: %s", index, e)
+                    self._kill(index)
+                    self.restarts += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                finally:
+                    self._busy -= 1
+
+                if not future.done():
+                    if "error" in reply:
+                        future.set_exception(RuntimeError(reply["error"]))
+                    else:
+                        future.set_result((reply["cookies"], reply["result"]))
+                rss = reply.get("rss")
+                if rss is not None and rss > self.max_rss:
+                    browser_log.warning("安全验证工作进程 %d 内存 %.0fMB 超过上限，重启", index, rss / 1024 / 1024)
+                    self._stop(index)
+                    self.restarts += 1
+        except Exception as e:
+            # 循环随后由 _restart_loop 重启，正在处理的任务直接失败
+            if future is not None and not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            self._stop(index)
+
+    def stats(self) -> Dict[str, Any]:
+        """工作进程池运行状态"""
+        return {
+            "workers": self.size,
+            "alive": sum(1 for proc in self._procs.values() if proc.returncode is None),
+            "busy": self._busy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": self.jobs,
+            "restarts": self.restarts
+        }
+
+    def close(self):
+        """停止工作进程池：工作进程在标准输入关闭后关闭浏览器并退出"""
+        for task in self._loops:
+            task.cancel()
+        self._loops = []
+        for index in list(self._procs):
+            self._stop(index)
+
+
+security_workers = SecurityCheckWorkerPool()
+
+
+async def security_check_worker_main():
+    """工作进程入口：逐行读取任务，在本进程的浏览器池中执行，结果逐行写回"""
+    # 协议使用原来的标准输出；之后任何写到标准输出的内容（包括子进程继承的）都转到标准错误
+    protocol = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    if os.environ.get("BOSS_ZP_PREWARM") == "1" and not js_security_engine.enabled:
+        browser_pool.enable_spare()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            job = json.loads(line)
+            try:
+                cookies, result = await BossZhipinAPI.run_security_check(job["cookies"])
+                reply = {"cookies": cookies, "result": result}
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            reply["rss"] = process_tree_rss(os.getpid())
+            protocol.write(json.dumps(reply).encode("utf-8") + b"\n")
+            protocol.flush()
+    finally:
+        await browser_pool.close()
+
+
+# 登录监控：以协程方式在服务器事件循环上监控扫码和确认状态
+async def _wait_for_scan_and_confirm(account: AccountSession, qr_id: str, generation: int) -> bool:
+    """长轮询扫码和确认接口，用户确认登录后返回 True；已登录或已开始新一轮登录时返回 False"""
+    client = account.get_client()
+    scan_url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/qrcode/scan?uuid={qr_id}"
+    confirm_url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/qrcode/scanLogin?qrId={qr_id}&status=1"
+
+    # 阶段1：等待扫码（长轮询）
+    login_log.info("开始监控扫码状态")
+    scan_count = 0
+    errors = 0
+    while True:
+        if account.login_status.login_step == "logged_in" or not account.is_current(generation):
+            login_log.info("已登录或已开始新一轮登录，停止监控")
+            return False
+
+        try:
+            scan_count += 1
+            resp = await client.get(scan_url, timeout=35)
+
+            errors = 0
+
+            # 检查响应内容，而不只是状态码
+            if resp.status_code == 200:
+                json_data = resp.json()
+                if json_data.get("scaned"):
+                    login_log.info("用户已扫码，进入确认阶段")
+                    if not account.update_login_status(generation, login_step="scanned"):
+                        return False
+                    break  # 退出扫码循环，进入确认阶段
+                elif log_sampled(scan_count):
+                    login_log.debug("等待扫码，第 %d 次轮询: %s", scan_count, json_data.get("msg"))
+            else:
+                login_log.warning("未知扫码状态码: %d", resp.status_code)
+
+        except httpx.ReadTimeout:
+            if log_sampled(scan_count):
+                login_log.debug("等待扫码超时，第 %d 次轮询", scan_count)
+            continue
+        except Exception as e:
+            errors += 1
+            login_log.error("调用scan接口出错: %s", e)
+            await asyncio.sleep(backoff_delay(errors))
+            continue
+
+        await asyncio.sleep(1)
+
+    # 阶段2：等待确认（长轮询）
+    login_log.info("开始监控确认状态")
+    confirm_count = 0
+    errors = 0
+    while True:
+        if not account.is_current(generation):
+            login_log.info("已开始新一轮登录，停止监控")
+            return False
+
+        try:
+            confirm_count += 1
+            resp = await client.get(confirm_url, timeout=35)
+            errors = 0
+
+            # 检查响应内容
+            if resp.status_code == 200:
+                login_log.info("用户已确认登录，获取Cookie")
+                return account.update_login_status(generation, login_step="confirmed")
+
+            json_data = resp.json()
+            if log_sampled(confirm_count):
+                login_log.debug("等待确认，第 %d 次轮询: %s", confirm_count, json_data.get("msg"))
+
+        except httpx.ReadTimeout:
+            if log_sampled(confirm_count):
+                login_log.debug("等待确认超时，第 %d 次轮询", confirm_count)
+            continue
+        except Exception as e:
+            errors += 1
+            login_log.error("调用confirm接口出错: %s", e)
+            await asyncio.sleep(backoff_delay(errors))
+            continue
+
+        await asyncio.sleep(1)
+
+
+async def _finish_login(account: AccountSession, qr_id: str, generation: int, tenant: str = "default"):
+    """用户确认后获取Cookie并完成安全验证；期间开始了新一轮登录时放弃写入
+
+    安全验证要先取得登录名额，排队已满或等待超时抛出 LoginRejected
+    """
+    client = account.get_client()
+
+    # 获取最终Cookie；dispatcher 没有下发 wt2 时登录并未生效，不再进行安全验证
+    cookies, bst_value = await BossZhipinAPI.get_final_cookie(client, qr_id)
+    if "wt2" not in cookies:
+        login_log.error("dispatcher 未返回登录 Cookie: %s", sorted(cookies))
+        account.update_login_status(generation, login_step="failed", error_message="未获取到登录 Cookie，请重新登录")
+        return
+
+    # 阶段3：取得登录名额后完成安全验证（先用 JS 引擎，必要时用无头浏览器；失败时 complete_security_check 返回初始 Cookie）
+    def on_queued(position: int, expected_wait: float):
+        # 进入队列和之后每次位置变化时调用，调用方通过登录状态看到排队位置和预计等待时间
+        if account.login_status.queue_position is None:
+            login_log.info("安全验证排队中，第 %d 位，预计等待 %.0f 秒", position, expected_wait)
+        account.update_login_status(
+            generation, login_step="queued", queue_position=position, expected_wait_seconds=round(expected_wait, 1)
+        )
+
+    slot = await login_admission.acquire(account.account_id, tenant, on_queued)
+    try:
+        login_log.info("开始安全验证流程")
+        if not account.update_login_status(
+            generation, login_step="security_check", queue_position=None, expected_wait_seconds=None
+        ):
+            return
+        final_cookies = await BossZhipinAPI.complete_security_check(cookies, client)
+    finally:
+        login_admission.release(slot)
+
+    if not account.update_login_status(
+        generation,
+        is_logged_in=True,
+        cookies=final_cookies,
+        bst=bst_value,
+        login_step="logged_in"
+    ):
+        return
+    BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, bst_value)
+    await state.save_account(account)
+    login_log.info("登录成功，Cookie 已保存")
+
+
+class LoginWatchScheduler:
+    """登录监控调度器：每个待确认的二维码登录是服务器事件循环上的一个任务
+
+    多副本部署时，监控任务持有共享后端中的租约并定期续期；副本下线后租约过期，
+    其他副本会接管仍在等待扫码的登录
+    """
+
+    def __init__(self, qr_ttl: float = None, lease_ttl: float = None):
+        # 二维码有效期，超时后取消监控
+        self.qr_ttl = qr_ttl or float(os.environ.get("BOSS_ZP_QR_TTL", "120"))
+        self.lease_ttl = lease_ttl or float(os.environ.get("BOSS_ZP_WATCH_LEASE_TTL", "15"))
+        self._watches: Dict[str, asyncio.Task] = {}
+        self._adopt_task: Optional[asyncio.Task] = None
+
+    def start(self, account: AccountSession, qr_id: str, ttl: float = None, tenant: str = "default") -> asyncio.Task:
+        """开始监控二维码登录，同一账号已有的监控会被取消；ttl 为监控时长，默认到二维码过期为止，tenant 为安全验证排队时的租户"""
+        if ttl is None:
+            ttl = self.remaining(account)
+        if self.cancel(account.account_id):
+            login_log.info("二维码已更新，取消旧的监控", extra={"account_id": account.account_id})
+
+        generation = account.login_generation
+        if shared_state.shared:
+            # 新的一轮登录直接抢占租约，其他副本上旧一轮的监控续期失败后自行退出
+            shared_state.submit(
+                shared_state.acquire, f"watch:{account.account_id}", self._lease_owner(generation), self.lease_ttl, True,
+                error="获取登录监控租约失败", extra={"account_id": account.account_id}
+            )
+            account.watched_generation = generation
+            account.publish_shared()
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(account, qr_id, generation, ttl, tenant), name=f"login-watch-{account.account_id}"
+        )
+        self._watches[account.account_id] = task
+        task.add_done_callback(lambda t, key=account.account_id: self._discard(key, t))
+        return task
+
+    def remaining(self, account: AccountSession) -> float:
+        """账号当前二维码的剩余有效秒数，没有记录过期时间时为完整有效期"""
+        if account.qr_expires_at is None:
+            return self.qr_ttl
+        return max(account.qr_expires_at - time.time(), 0.0)
+
+    def cancel(self, account_id: str) -> bool:
+        """取消账号的登录监控"""
+        task = self._watches.pop(account_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    @property
+    def active_count(self) -> int:
+        """正在进行的登录监控数量"""
+        return sum(1 for task in self._watches.values() if not task.done())
+
+    def _discard(self, account_id: str, task: asyncio.Task):
+        if self._watches.get(account_id) is task:
+            del self._watches[account_id]
+
+    @staticmethod
+    def _lease_owner(generation: int) -> str:
+        # 租约持有者带上登录代数，本副本上新旧两轮监控不会释放彼此的租约
+        return f"{REPLICA_ID}/{generation}"
+
+    async def _run(self, account: AccountSession, qr_id: str, generation: int, ttl: float, tenant: str):
+        # 监控任务内的日志都带上账号和二维码ID
+        with log_context(account_id=account.account_id, qr_id=qr_id):
+            lease = None
+            if shared_state.shared:
+                lease = asyncio.create_task(self._keep_lease(account, generation, asyncio.current_task()))
+            try:
+                confirmed = await asyncio.wait_for(
+                    _wait_for_scan_and_confirm(account, qr_id, generation), timeout=ttl
+                )
+                if confirmed:
+                    await _finish_login(account, qr_id, generation, tenant)
+            except asyncio.TimeoutError:
+                login_log.info("二维码已过期")
+                account.update_login_status(generation, login_step="expired", error_message="二维码已过期，请重新登录")
+            except LoginRejected as e:
+                login_log.warning("安全验证未能取得登录名额: %s", e)
+                account.update_login_status(generation, login_step="failed", error_message=str(e))
+            except asyncio.CancelledError:
+                login_log.info("监控已取消")
+                raise
+            except Exception as e:
+                login_log.exception("监控任务异常: %s", e)
+                account.update_login_status(generation, login_step="failed", error_message=f"登录监控异常: {e}")
+            finally:
+                if lease is not None:
+                    lease.cancel()
+                    shared_state.submit(
+                        shared_state.release, f"watch:{account.account_id}", self._lease_owner(generation),
+                        error="释放登录监控租约失败", extra={"account_id": account.account_id}
+                    )
+                login_log.debug("监控任务结束")
+
+    async def _keep_lease(self, account: AccountSession, generation: int, watch: asyncio.Task):
+        """定期续期租约；租约被抢占或其他副本开始了新一轮登录时取消本副本的监控"""
+        key, owner = f"watch:{account.account_id}", self._lease_owner(generation)
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                held = await shared_state.run(shared_state.acquire, key, owner, self.lease_ttl)
+            except StateBackendError as e:
+                login_log.warning("续期登录监控租约失败: %s", e)
+                continue
+            await account.refresh_shared()
+            if not held or not account.is_current(generation):
+                login_log.info("登录已由其他副本接管或重新开始，停止本副本的监控")
+                watch.cancel()
+                return
+
+    def start_adopting(self):
+        """多副本部署时在后台定期接管其他副本遗留的登录"""
+        if shared_state.shared and self._adopt_task is None:
+            self._adopt_task = asyncio.get_running_loop().create_task(self._adopt_loop(), name="login-adopt")
+
+    def stop_adopting(self):
+        if self._adopt_task is not None:
+            self._adopt_task.cancel()
+            self._adopt_task = None
+
+    async def _adopt_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl)
+            try:
+                await self.adopt_orphans()
+            except StateBackendError as e:
+                login_log.warning("检查遗留登录失败: %s", e)
+
+    async def adopt_orphans(self) -> int:
+        """接管租约已过期的登录：仍在等待扫码的继续监控，已确认的（Cookie 在原副本上）标记为过期；返回接管的数量"""
+        adopted = 0
+        now = time.time()
+        for key in await shared_state.run(shared_state.keys, "login:"):
+            account_id = key[len("login:"):]
+            task = self._watches.get(account_id)
+            if task is not None and not task.done():
+                continue
+            data = await shared_state.run(shared_state.get, key)
+            if data is None:
+                continue
+            snapshot = json.loads(data)
+            if not snapshot["watched"] or snapshot["login_step"] in LOGIN_SETTLED_STEPS:
+                continue
+            generation = snapshot["generation"]
+            lease_key, owner = f"watch:{account_id}", self._lease_owner(generation)
+            if not await shared_state.run(shared_state.acquire, lease_key, owner, self.lease_ttl):
+                continue
+
+            account = await state.get_account(account_id)
+            if not account.is_current(generation):
+                await shared_state.run(shared_state.release, lease_key, owner)
+                continue
+            remaining = (snapshot["qr_expires_at"] or 0) - now
+            if snapshot["login_step"] in ("qr_generated", "scanned") and remaining > 0:
+                login_log.info("接管其他副本遗留的登录监控", extra={"account_id": account_id, "qr_id": snapshot["qr_id"]})
+                self.start(account, snapshot["qr_id"], ttl=remaining)
+                adopted += 1
+            else:
+                account.update_login_status(
+                    generation, login_step="expired", error_message="登录所在的服务副本已下线，请重新登录"
+                )
+                await shared_state.run(shared_state.release, lease_key, owner)
+        return adopted
+
+
+login_watcher = LoginWatchScheduler()
+
+
+# 登录准入控制
+class LoginRejected(Exception):
+    """登录排队已满或等待超时"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def security_check_capacity() -> Optional[int]:
+    """能同时进行的安全验证数：启用工作进程池时是工作进程数（每个一次一个任务），否则是浏览器池的上下文数；
+    只用 JS 引擎时不启动浏览器，返回 None
+    """
+    if SECURITY_ENGINE == "js":
+        return None
+    if security_workers.enabled:
+        return security_workers.size
+    return browser_pool.max_contexts
+
+
+@dataclass
+class LoginSlot:
+    """一次安全验证占用的登录名额"""
+    account_id: str
+    tenant: str
+    acquired: float
+
+
+class LoginAdmission:
+    """登录准入控制：限制同时进行的安全验证数，超出的按租户（MCP 客户端会话）轮转排队，队列满时直接拒绝
+
+    安全验证是登录中唯一消耗浏览器和 CPU 的步骤，名额只在这一步占用；等待扫码的时间取决于用户，
+    不占名额，否则名额的占用时长和排队时间都由扫码快慢决定。登录高峰时延迟可预期，不会把内存耗尽
+    """
+
+    # 只用 JS 引擎、又没有配置上限时的名额数
+    JS_ONLY_CAPACITY = 32
+
+    def __init__(self, capacity: int = None, max_queue: int = None, queue_timeout: float = None):
+        # 配置的名额上限，0 表示跟随安全验证的实际并发能力
+        self.max_active = capacity or int(os.environ.get("BOSS_ZP_MAX_ACTIVE_LOGINS", "0"))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("BOSS_ZP_LOGIN_QUEUE_SIZE", "64"))
+        self.queue_timeout = queue_timeout or float(os.environ.get("BOSS_ZP_LOGIN_QUEUE_TIMEOUT", "60"))
+        self._held: Dict[str, LoginSlot] = {}
+        # 租户 -> 等待者队列；每放行一个就把该租户移到队尾，实现轮转
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._waiting = 0
+        # 名额占用时长（安全验证耗时）的指数移动平均，用于估算等待时间；首个样本之前按 10 秒估算
+        self.avg_hold = 10.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        """名额数不超过 security_check_capacity()：排队只发生在这里，浏览器池和工作进程池不再积压，
+        排队位置和预计等待时间才与实际一致"""
+        limit = security_check_capacity()
+        if limit is None:
+            return self.max_active or self.JS_ONLY_CAPACITY
+        return min(self.max_active, limit) if self.max_active else limit
+
+    @property
+    def active(self) -> int:
+        return len(self._held)
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def expected_wait(self, position: int) -> float:
+        """排在第 position 位（从 1 开始）时的预计等待秒数"""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.capacity) * self.avg_hold
+
+    def _admission_order(self) -> list:
+        """按轮转顺序排好的等待者 (account_id, future, on_queued)"""
+        queues = [list(waiters) for waiters in self._queues.values()]
+        order = []
+        for round_index in range(max((len(waiters) for waiters in queues), default=0)):
+            for waiters in queues:
+                if round_index < len(waiters):
+                    order.append(waiters[round_index])
+        return order
+
+    def position(self, future: asyncio.Future) -> int:
+        """等待者按轮转顺序的放行位置（从 1 开始），不在队列中时返回 0"""
+        for position, entry in enumerate(self._admission_order(), 1):
+            if entry[1] is future:
+                return position
+        return 0
+
+    def _notify_waiters(self):
+        """队列变化后把每个等待者的新位置和预计等待时间告诉它"""
+        for position, (_, _, on_queued) in enumerate(self._admission_order(), 1):
+            if on_queued is not None:
+                on_queued(position, self.expected_wait(position))
+
+    def check(self):
+        """排队已满时抛出 LoginRejected；发起登录前调用，避免用户扫码后才被拒绝"""
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise LoginRejected("登录请求过多，请稍后重试", self.expected_wait(self._waiting + 1))
+
+    async def acquire(self, account_id: str, tenant: str, on_queued=None) -> LoginSlot:
+        """获取登录名额，队列已满或等待超时抛出 LoginRejected
+
+        需要排队时，进入队列和之后每次位置变化都以 (位置, 预计等待秒数) 同步调用 on_queued
+        """
+        if account_id in self._held:
+            # 同一账号重新登录，沿用原名额（旧的监控随即被取消，其释放不再生效）
+            return self._grant(account_id, tenant)
+        if len(self._held) < self.capacity and not self._waiting:
+            return self._grant(account_id, tenant)
+        self.check()
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant, deque()).append((account_id, future, on_queued))
+        self._waiting += 1
+        # 新租户的等待者会插到其他租户之前，所有人的位置都可能变化
+        self._notify_waiters()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 已经放行但调用方不再需要，立即归还
+                self.release(future.result())
+            else:
+                future.cancel()
+                self._discard(tenant, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise LoginRejected(f"登录排队超过 {self.queue_timeout:.0f} 秒，请稍后重试", self.avg_hold)
+            raise
+
+    def release(self, slot: LoginSlot):
+        """登录结束后归还名额，并按轮转顺序放行下一个等待者"""
+        if self._held.get(slot.account_id) is not slot:
+            return
+        del self._held[slot.account_id]
+        self.avg_hold = 0.8 * self.avg_hold + 0.2 * (time.monotonic() - slot.acquired)
+        admitted = False
+        while self._queues and len(self._held) < self.capacity:
+            tenant, waiters = next(iter(self._queues.items()))
+            account_id, future, _ = waiters.popleft()
+            self._waiting -= 1
+            del self._queues[tenant]
+            if waiters:
+                self._queues[tenant] = waiters
+            if not future.done():
+                future.set_result(self._grant(account_id, tenant))
+                admitted = True
+        if admitted:
+            self._notify_waiters()
+
+    def _grant(self, account_id: str, tenant: str) -> LoginSlot:
+        slot = LoginSlot(account_id, tenant, time.monotonic())
+        self._held[account_id] = slot
+        self.admitted += 1
+        return slot
+
+    def _discard(self, tenant: str, future: asyncio.Future):
+        waiters = self._queues.get(tenant)
+        if not waiters:
+            return
+        for entry in list(waiters):
+            if entry[1] is future:
+                waiters.remove(entry)
+                self._waiting -= 1
+        if not waiters:
+            del self._queues[tenant]
+        self._notify_waiters()
+
+    def stats(self) -> Dict[str, Any]:
+        """准入控制运行状态"""
+        return {
+            "active": self.active,
+            "capacity": self.capacity,
+            "waiting": self._waiting,
+            "max_queue": self.max_queue,
+            "tenants_waiting": len(self._queues),
+            "avg_hold_seconds": round(self.avg_hold, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+login_admission = LoginAdmission()
+
+
+def client_tenant(ctx: Context) -> str:
+    """排队时的租户：MCP 客户端ID，没有时使用会话ID"""
+    try:
+        return ctx.client_id or ctx.session_id
+    except RuntimeError:
+        return "default"
+
+
+# 职位列表缓存
+class TTLCache:
+    """带过期时间的 LRU 缓存，记录命中/未命中次数"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        """读取未过期的缓存值，并把它移到 LRU 队尾"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        """写入缓存，顺带清理已过期的条目，超出容量时淘汰最久未使用的条目"""
+        self.purge_expired()
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        """删除所有已过期的条目，返回删除数量"""
+        now = time.monotonic()
+        return self.invalidate(lambda key: self._data[key][0] < now)
+
+    def invalidate(self, predicate) -> int:
+        """删除满足条件的缓存键，返回删除数量"""
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+# 缓存键以账号ID开头：(account_id, page, pageSize, experience, jobType, salary, encryptExpectId)
+job_cache = TTLCache(
+    ttl=float(os.environ.get("BOSS_ZP_JOB_CACHE_TTL", "60")),
+    max_size=int(os.environ.get("BOSS_ZP_JOB_CACHE_SIZE", "256"))
+)
+
+# 二维码图片只保存在内存中，有效期与二维码一致，过期后自动淘汰
+qr_images = TTLCache(
+    ttl=login_watcher.qr_ttl,
+    max_size=int(os.environ.get("BOSS_ZP_QR_STORE_SIZE", "256"))
+)
+
+
+# 登录预热
+@dataclass
+class PrewarmedQR:
+    """预先申请好的二维码"""
+    qr_id: str
+    image: bytes
+    cookies: httpx.Cookies
+    created: float = field(default_factory=time.monotonic)
+
+
+class LoginPrewarmer:
+    """登录预热：后台维持一小批新鲜的 qrId 和二维码图片，并让浏览器池常备一个上下文"""
+
+    def __init__(self, enabled: bool = None, pool_size: int = None, max_age: float = None):
+        self.enabled = enabled if enabled is not None else os.environ.get("BOSS_ZP_PREWARM", "0") == "1"
+        self.pool_size = pool_size or int(os.environ.get("BOSS_ZP_PREWARM_QR_POOL", "2"))
+        # 超过这个时间的预申请二维码直接丢弃重新申请，保证交给用户时还有足够的有效期
+        self.max_age = max_age or float(os.environ.get("BOSS_ZP_PREWARM_MAX_AGE", "30"))
+        self._pool: "deque[PrewarmedQR]" = deque()
+        self._session = AccountSession("prewarm")
+        self._task = None
+        self._wakeup = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """在当前事件循环上启动预热任务（未开启预热时不做任何事）"""
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="login-prewarm")
+        # JS 引擎优先时只预先加载 V8，浏览器仅作回退不常备上下文；
+        # 使用工作进程池时由工作进程各自准备备用上下文
+        if js_security_engine.enabled:
+            js_security_engine.warm()
+        elif not security_workers.enabled:
+            browser_pool.enable_spare()
+        login_log.info("登录预热已开启，二维码池大小 %d", self.pool_size)
+
+    def take(self) -> Optional[PrewarmedQR]:
+        """取出一个仍然新鲜的预申请二维码，没有时返回 None"""
+        if not self.enabled:
+            return None
+        self._drop_stale()
+        if not self._pool:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._wakeup.set()
+        return self._pool.popleft()
+
+    def _drop_stale(self):
+        now = time.monotonic()
+        while self._pool and now - self._pool[0].created > self.max_age:
+            self._pool.popleft()
+
+    async def _fetch(self) -> PrewarmedQR:
+        client = self._session.get_client()
+        client.cookies.clear()
+        qr_id = await BossZhipinAPI.get_randkey(client)
+        image = await BossZhipinAPI.get_qrcode(client, qr_id)
+        # 申请二维码时上游下发的 Cookie 随二维码一起交给使用它的账号
+        return PrewarmedQR(qr_id=qr_id, image=image, cookies=httpx.Cookies(client.cookies))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            self._drop_stale()
+            if len(self._pool) < self.pool_size:
+                try:
+                    self._pool.append(await self._fetch())
+                except (httpx.HTTPError, KeyError, ValueError) as e:
+                    login_log.warning("预申请二维码失败: %s", e)
+                    await asyncio.sleep(5)
+                continue
+            # 池已满：等到最早的二维码过期或有二维码被取走
+            wait = self.max_age - (time.monotonic() - self._pool[0].created)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(wait, 0.1))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """预热状态"""
+        return {
+            "enabled": self.enabled,
+            "ready": len(self._pool),
+            "pool_size": self.pool_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    async def close(self):
+        """停止预热任务并关闭连接"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pool.clear()
+        await self._session.close()
+
+
+login_prewarmer = LoginPrewarmer()
+
+
+async def new_login_qr(account: AccountSession) -> tuple[str, bytes]:
+    """为账号生成登录二维码，开启预热时直接使用预先申请好的"""
+    client = account.get_client()
+    prewarmed = login_prewarmer.take()
+    if prewarmed is not None:
+        client.cookies.update(prewarmed.cookies)
+        qr_id, image = prewarmed.qr_id, prewarmed.image
+        # 预申请的二维码在池中已经等待了一段时间，有效期从申请时算起
+        issued_at = time.time() - (time.monotonic() - prewarmed.created)
+    else:
+        issued_at = time.time()
+        qr_id = await BossZhipinAPI.get_randkey(client)
+        image = await BossZhipinAPI.get_qrcode(client, qr_id)
+    await account.begin_login(qr_id, issued_at)
+    return qr_id, image
+
+
+# 合并并发的相同请求
+class SingleFlight:
+    """同一个键同时只有一个调用在执行，并发的相同调用等待并共享它的结果"""
+
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Task] = {}
+        self.shared = 0
+
+    async def do(self, key, func):
+        """执行 func()；已有相同键的调用在进行时直接等待它的结果"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # 某个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    def _done(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+upstream_flights = SingleFlight()
+
+
+# 限速
+class TokenBucket:
+    """异步令牌桶：rate 为每秒补充的令牌数，capacity 为允许的突发量"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """取得一个令牌，不足时等待"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """第 attempt 次连续失败后的等待时间：指数增长，带随机抖动避免多个任务同时重试"""
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+class UpstreamCircuitOpen(httpx.RequestError):
+    """账号的上游熔断器处于打开状态，请求没有发出"""
+
+
+@dataclass
+class _GuardState:
+    bucket: Optional[TokenBucket]
+    failures: int = 0
+    not_before: float = 0.0
+    opened_at: Optional[float] = None
+
+
+# 扫码/确认长轮询在用户操作之前按设计会读超时，读超时不代表上游故障
+LONG_POLL_PATHS = ("/wapi/zppassport/qrcode/scan", "/wapi/zppassport/qrcode/scanLogin")
+
+
+def is_upstream_failure(request: httpx.Request, error: httpx.TransportError) -> bool:
+    """没有拿到完整响应的请求是否计入退避和熔断；长轮询接口的读超时不计入"""
+    return not (isinstance(error, httpx.ReadTimeout) and request.url.path in LONG_POLL_PATHS)
+
+
+class _GuardedTransport(httpx.AsyncBaseTransport):
+    """包装真正的传输层，把连接失败、超时等没有拿到响应的错误也计入账号的退避和熔断"""
+
+    def __init__(self, guard: "UpstreamGuard", account_id: str, transport: httpx.AsyncBaseTransport):
+        self._guard = guard
+        self._account_id = account_id
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return await self._transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            if is_upstream_failure(request, e):
+                self._guard.record(self._account_id, True)
+            raise
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class UpstreamGuard:
+    """所有上游请求的统一闸门：全局和账号级令牌桶、失败后自适应退避、连续失败熔断
+
+    以 httpx 事件钩子和传输层包装的形式挂在每个账号的客户端上，BossZhipinAPI 的所有请求都会经过这里
+    """
+
+    def __init__(
+        self,
+        global_rate: float = None,
+        account_rate: float = None,
+        failure_threshold: int = None,
+        cooldown: float = None
+    ):
+        # 每秒请求数上限，0 表示不限速；突发量为一秒的配额
+        self.global_rate = global_rate if global_rate is not None else float(os.environ.get("BOSS_ZP_RATE_GLOBAL", "20"))
+        self.account_rate = account_rate if account_rate is not None else float(os.environ.get("BOSS_ZP_RATE_PER_ACCOUNT", "3"))
+        # 连续失败多少次后熔断，以及熔断持续的秒数
+        self.failure_threshold = failure_threshold or int(os.environ.get("BOSS_ZP_BREAKER_THRESHOLD", "5"))
+        self.cooldown = cooldown or float(os.environ.get("BOSS_ZP_BREAKER_COOLDOWN", "30"))
+        self._global = self._bucket(self.global_rate)
+        self._accounts: Dict[str, _GuardState] = {}
+
+    @staticmethod
+    def _bucket(rate: float) -> Optional[TokenBucket]:
+        return TokenBucket(rate, capacity=max(1.0, rate)) if rate > 0 else None
+
+    def _state(self, account_id: str) -> _GuardState:
+        guard = self._accounts.get(account_id)
+        if guard is None:
+            guard = self._accounts[account_id] = _GuardState(bucket=self._bucket(self.account_rate))
+        return guard
+
+    def forget(self, account_id: str):
+        """账号会话释放时清掉它的限流状态"""
+        self._accounts.pop(account_id, None)
+
+    def event_hooks(self, account_id: str) -> Dict[str, list]:
+        """生成绑定到账号的 httpx 事件钩子"""
+        async def on_request(request: httpx.Request):
+            await self.before_request(account_id, request)
+
+        async def on_response(response: httpx.Response):
+            await self.after_response(account_id, response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def transport(self, account_id: str, **kwargs) -> httpx.AsyncBaseTransport:
+        """生成绑定到账号的传输层，kwargs 传给 httpx.AsyncHTTPTransport"""
+        return _GuardedTransport(self, account_id, httpx.AsyncHTTPTransport(**kwargs))
+
+    async def before_request(self, account_id: str, request: httpx.Request):
+        """熔断时直接失败；否则等待退避结束并取得账号和全局令牌"""
+        guard = self._state(account_id)
+        now = time.monotonic()
+        if guard.opened_at is not None:
+            remaining = guard.opened_at + self.cooldown - now
+            if remaining > 0:
+                raise UpstreamCircuitOpen(f"上游连续失败，暂停请求 {remaining:.0f} 秒", request=request)
+            # 冷却结束：放行这一个请求试探，结果出来之前其他请求继续熔断
+            guard.opened_at = now
+        if guard.not_before > now:
+            await asyncio.sleep(guard.not_before - now)
+        if guard.bucket is not None:
+            await guard.bucket.acquire()
+        if self._global is not None:
+            await self._global.acquire()
+
+    async def after_response(self, account_id: str, response: httpx.Response):
+        """HTTP 429/5xx 或业务 code 非 0 视为失败"""
+        failed = response.status_code == 429 or response.status_code >= 500
+        if not failed and response.headers.get("content-type", "").startswith("application/json"):
+            try:
+                await response.aread()
+            except httpx.TransportError as e:
+                # 读响应体时断开或超时
+                if is_upstream_failure(response.request, e):
+                    self.record(account_id, True)
+                raise
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            failed = isinstance(data, dict) and data.get("code") not in (None, 0)
+        self.record(account_id, failed)
+
+    def record(self, account_id: str, failed: bool):
+        """记录一次请求结果，调整退避时间和熔断状态"""
+        guard = self._state(account_id)
+        if not failed:
+            guard.failures = 0
+            guard.not_before = 0.0
+            guard.opened_at = None
+            return
+        guard.failures += 1
+        now = time.monotonic()
+        guard.not_before = now + backoff_delay(guard.failures)
+        if guard.failures >= self.failure_threshold:
+            if guard.opened_at is None:
+                upstream_log.warning(
+                    "上游连续失败 %d 次，暂停请求 %.0f 秒", guard.failures, self.cooldown,
+                    extra={"account_id": account_id}
+                )
+                CIRCUIT_OPENED.inc()
+            guard.opened_at = now
+
+    @property
+    def open_count(self) -> int:
+        """处于熔断状态的账号数"""
+        return sum(1 for guard in self._accounts.values() if guard.opened_at is not None)
 
 
-@dataclass
-class GreetingRequest:
-    """打招呼请求数据模型"""
-    security_id: str
-    job_id: str
-    message: str = "您好，我对这个职位很感兴趣，希望可以进一步沟通"
+upstream_guard = UpstreamGuard()
 
 
-# 全局状态管理
-class BossZhipinState:
-    """Boss直聘全局状态管理"""
+# 打招呼记录
+class GreetingRecord:
+    """本地已打招呼职位记录，用于批量打招呼时去重"""
 
-    def __init__(self):
-        self.login_status = LoginStatus()
-        self.session = None
-        self.static_dir = Path("static")
-        self.static_dir.mkdir(exist_ok=True)
-
-    def get_session(self) -> requests.Session:
-        """获取或创建HTTP会话"""
-        if self.session is None:
-            self.session = requests.Session()
-            self.session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Referer': 'https://www.zhipin.com/web/user/?ka=header-login',
-                'Origin': 'https://www.zhipin.com'
-            })
-        return self.session
-
-    def update_login_status(self, **kwargs):
-        """更新登录状态"""
-        for key, value in kwargs.items():
-            if hasattr(self.login_status, key):
-                setattr(self.login_status, key, value)
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.environ.get("BOSS_ZP_GREETED_FILE", "data/greeted.json"))
+        self._records: Optional[Dict[str, Dict[str, int]]] = None
 
-    def reset_login(self):
-        """重置登录状态"""
-        self.login_status = LoginStatus()
-        if self.session:
-            self.session.cookies.clear()
-            self.session = None
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        if self._records is None:
+            try:
+                self._records = json.loads(self.path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._records = {}
+            except ValueError as e:
+                greeting_log.warning("记录文件损坏，重新开始记录: %s", e)
+                self._records = {}
+        return self._records
+
+    def has(self, account_id: str, job_id: str) -> bool:
+        """该账号是否已向该职位打过招呼"""
+        return job_id in self._load().get(account_id, {})
+
+    def add(self, account_id: str, job_id: str):
+        """记录一次成功的打招呼（需调用 save 落盘）"""
+        self._load().setdefault(account_id, {})[job_id] = int(time.time())
+
+    def save(self):
+        """原子写入记录文件"""
+        if self._records is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._records, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+greeting_record = GreetingRecord()
+
+
+# 本地职位索引
+class JobIndex:
+    """本地职位索引（SQLite + FTS5），按 securityId 增量写入，支持快速筛选和全文检索"""
+
+    SALARY_PATTERN = re.compile(r"(\d+)-(\d+)K", re.IGNORECASE)
+
+    def __init__(self, path: str = None):
+        self.path = Path(path or os.environ.get("BOSS_ZP_JOB_INDEX", "data/jobs.db"))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self.has_fts = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表（调用方需持有锁）"""
+        if self._conn is not None:
+            return self._conn
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                security_id TEXT PRIMARY KEY,
+                account_id TEXT NOT NULL,
+                encrypt_boss_id TEXT,
+                job_name TEXT,
+                brand_name TEXT,
+                brand_scale TEXT,
+                city TEXT,
+                industry TEXT,
+                skills TEXT,
+                search_text TEXT,
+                salary_min INTEGER,
+                salary_max INTEGER,
+                content_hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_boss ON jobs(encrypt_boss_id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_city ON jobs(city);
+            CREATE INDEX IF NOT EXISTS idx_jobs_salary ON jobs(salary_min, salary_max);
+        """)
+        try:
+            # trigram 分词支持中文子串检索（SQLite >= 3.34）
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+                    search_text, content='jobs', content_rowid='rowid', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS jobs_ai AFTER INSERT ON jobs BEGIN
+                    INSERT INTO jobs_fts(rowid, search_text) VALUES (new.rowid, new.search_text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_ad AFTER DELETE ON jobs BEGIN
+                    INSERT INTO jobs_fts(jobs_fts, rowid, search_text) VALUES ('delete', old.rowid, old.search_text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_au AFTER UPDATE OF search_text ON jobs BEGIN
+                    INSERT INTO jobs_fts(jobs_fts, rowid, search_text) VALUES ('delete', old.rowid, old.search_text);
+                    INSERT INTO jobs_fts(rowid, search_text) VALUES (new.rowid, new.search_text);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            index_log.warning("当前 SQLite 不支持 FTS5 trigram，关键词检索退化为 LIKE: %s", e)
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    @classmethod
+    def _parse_salary(cls, salary_desc: Optional[str]) -> tuple:
+        """把 "20-40K·14薪" 解析为 (20, 40)，无法解析时返回 (None, None)"""
+        match = cls.SALARY_PATTERN.search(salary_desc or "")
+        if not match:
+            return None, None
+        return int(match.group(1)), int(match.group(2))
+
+    def upsert(self, account_id: str, jobs: List[JobInfo]) -> Dict[str, int]:
+        """写入一批职位：新职位插入，内容变化的更新，未变化的只刷新 last_seen"""
+        now = int(time.time())
+        jobs = [job for job in jobs if job.security_id]
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if not jobs:
+            return counts
+
+        with self._lock:
+            conn = self._connect()
+            ids = [job.security_id for job in jobs]
+            placeholders = ",".join("?" * len(ids))
+            existing = {
+                row["security_id"]: row["content_hash"]
+                for row in conn.execute(f"SELECT security_id, content_hash FROM jobs WHERE security_id IN ({placeholders})", ids)
+            }
 
+            rows, touched = [], []
+            for job in jobs:
+                data = json.dumps(job.to_dict(), ensure_ascii=False, sort_keys=True)
+                content_hash = hashlib.sha1(data.encode("utf-8")).hexdigest()
+                security_id = job.security_id
+                if existing.get(security_id) == content_hash:
+                    touched.append((now, security_id))
+                    counts["unchanged"] += 1
+                    continue
 
-# 全局状态实例
-state = BossZhipinState()
+                counts["updated" if security_id in existing else "inserted"] += 1
+                skills = " ".join(job.skills or [])
+                search_text = " ".join(filter(None, [
+                    job.title, job.company, job.industry, job.location,
+                    job.area_district, skills, " ".join(job.job_labels or [])
+                ]))
+                salary_min, salary_max = self._parse_salary(job.salary)
+                rows.append((
+                    security_id, account_id, job.encrypt_boss_id, job.title, job.company,
+                    job.brand_scale_name, job.location, job.industry, f" {skills.lower()} ",
+                    search_text, salary_min, salary_max, content_hash, data, now, now
+                ))
+
+            conn.executemany("""
+                INSERT INTO jobs (
+                    security_id, account_id, encrypt_boss_id, job_name, brand_name, brand_scale, city, industry,
+                    skills, search_text, salary_min, salary_max, content_hash, data, first_seen, last_seen
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(security_id) DO UPDATE SET
+                    account_id = excluded.account_id,
+                    encrypt_boss_id = excluded.encrypt_boss_id,
+                    job_name = excluded.job_name,
+                    brand_name = excluded.brand_name,
+                    brand_scale = excluded.brand_scale,
+                    city = excluded.city,
+                    industry = excluded.industry,
+                    skills = excluded.skills,
+                    search_text = excluded.search_text,
+                    salary_min = excluded.salary_min,
+                    salary_max = excluded.salary_max,
+                    content_hash = excluded.content_hash,
+                    data = excluded.data,
+                    last_seen = excluded.last_seen
+            """, rows)
+            conn.executemany("UPDATE jobs SET last_seen = ? WHERE security_id = ?", touched)
+            conn.commit()
+        return counts
+
+    def upsert_later(self, account_id: str, jobs: List[JobInfo]) -> asyncio.Task:
+        """在后台线程中写入职位，写入失败只记录日志"""
+        async def run():
+            try:
+                counts = await asyncio.to_thread(self.upsert, account_id, jobs)
+                if counts["inserted"] or counts["updated"]:
+                    index_log.debug(
+                        "新增 %d 个，更新 %d 个", counts["inserted"], counts["updated"],
+                        extra={"account_id": account_id}
+                    )
+            except sqlite3.Error as e:
+                index_log.error("写入失败: %s", e, extra={"account_id": account_id})
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    def search(
+        self,
+        keyword: str = "",
+        city: str = "",
+        brand_scale: str = "",
+        skills: Optional[List[str]] = None,
+        min_salary: int = 0,
+        max_salary: int = 0,
+        account_id: str = "",
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """按条件筛选职位；有关键词时按相关度排序，否则按最近出现时间排序"""
+        # 先打开数据库，has_fts 要建表后才知道
+        with self._lock:
+            conn = self._connect()
+        where, args = [], []
+        match_terms = []
+        for term in keyword.split():
+            # trigram 至少需要 3 个字符，更短的词用 LIKE
+            if self.has_fts and len(term) >= 3:
+                match_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                where.append("jobs.search_text LIKE ?")
+                args.append(f"%{term}%")
+        if city:
+            where.append("jobs.city = ?")
+            args.append(city)
+        if brand_scale:
+            where.append("jobs.brand_scale = ?")
+            args.append(brand_scale)
+        for skill in skills or []:
+            where.append("jobs.skills LIKE ?")
+            args.append(f"% {skill.lower()} %")
+        if min_salary:
+            where.append("jobs.salary_max >= ?")
+            args.append(min_salary)
+        if max_salary:
+            where.append("jobs.salary_min <= ?")
+            args.append(max_salary)
+        if account_id:
+            where.append("jobs.account_id = ?")
+            args.append(account_id)
+
+        if match_terms:
+            sql = "SELECT jobs.data FROM jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid WHERE jobs_fts MATCH ?"
+            args.insert(0, " AND ".join(match_terms))
+            order = "bm25(jobs_fts)"
+        else:
+            sql = "SELECT jobs.data FROM jobs WHERE 1 = 1"
+            order = "jobs.last_seen DESC"
+        for clause in where:
+            sql += f" AND {clause}"
+        sql += f" ORDER BY {order} LIMIT ?"
+        args.append(limit)
+
+        with self._lock:
+            rows = conn.execute(sql, args).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        with self._lock:
+            total = self._connect().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {"path": str(self.path), "total": total, "fts": self.has_fts}
+
+
+job_index = JobIndex()
+
+
+# 轻量安全验证：在嵌入式 JS 引擎（mini-racer，可选依赖）中执行安全验证页面的脚本，
+# 只模拟脚本用到的最小浏览器环境，成功时无需启动 Chromium；auto 模式下失败再回退到浏览器
+SECURITY_ENGINE = os.environ.get("BOSS_ZP_SECURITY_ENGINE", "auto").lower()  # auto / js / browser
+JS_SECURITY_TIMEOUT_MS = int(os.environ.get("BOSS_ZP_JS_SECURITY_TIMEOUT_MS", "5000"))
+JS_SECURITY_MAX_HEAP_MB = int(os.environ.get("BOSS_ZP_JS_SECURITY_MAX_HEAP_MB", "64"))
+JS_ENGINE_AVAILABLE = importlib.util.find_spec("py_mini_racer") is not None
+
+SCRIPT_TAG_RE = re.compile(r"<script\b([^>]*)>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+SCRIPT_SRC_RE = re.compile(r"""\bsrc\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+SCRIPT_TYPE_RE = re.compile(r"""\btype\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+
+# 最小浏览器环境：document.cookie 读写 Cookie 罐，其余 DOM/BOM 接口只提供脚本常用的空实现
+JS_BROWSER_SHIM = r"""
+(function (config) {
+  var g = globalThis, jar = config.cookies, listeners = [];
+  function noop() {}
+  function on(type, fn) { if (typeof fn === "function") listeners.push([type, fn]); }
+  function element(tag) {
+    return {
+      tagName: String(tag).toUpperCase(), style: {}, childNodes: [], children: [],
+      setAttribute: noop, getAttribute: function () { return null; }, removeAttribute: noop,
+      appendChild: function (c) { return c; }, removeChild: function (c) { return c; },
+      insertBefore: function (c) { return c; }, addEventListener: noop, removeEventListener: noop,
+      getContext: function () { return null; }, getElementsByTagName: function () { return []; }
+    };
+  }
+  function storage() {
+    var data = {};
+    return {
+      getItem: function (k) { return Object.prototype.hasOwnProperty.call(data, k) ? data[k] : null; },
+      setItem: function (k, v) { data[k] = String(v); },
+      removeItem: function (k) { delete data[k]; },
+      clear: function () { data = {}; }
+    };
+  }
+  var m = /^(\w+:)\/\/([^\/?#:]+)(:\d+)?([^?#]*)(\?[^#]*)?(#.*)?$/.exec(config.url) || [];
+  var location = {
+    href: config.url, protocol: m[1] || "https:", hostname: m[2] || "", port: (m[3] || "").slice(1),
+    host: (m[2] || "") + (m[3] || ""), pathname: m[4] || "/", search: m[5] || "", hash: m[6] || "",
+    origin: (m[1] || "https:") + "//" + (m[2] || "") + (m[3] || ""),
+    assign: function (u) { g.__redirect = String(u); }, replace: function (u) { g.__redirect = String(u); },
+    reload: noop, toString: function () { return config.url; }
+  };
+  var b64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+  g.window = g.self = g.top = g.parent = g;
+  g.location = location;
+  g.navigator = {
+    userAgent: config.userAgent, appVersion: config.userAgent.replace(/^Mozilla\//, ""),
+    platform: "MacIntel", language: "zh-CN", languages: ["zh-CN", "zh"], vendor: "Google Inc.",
+    cookieEnabled: true, webdriver: false, hardwareConcurrency: 8, plugins: [], mimeTypes: []
+  };
+  g.screen = { width: 1920, height: 1080, availWidth: 1920, availHeight: 1050, colorDepth: 24, pixelDepth: 24 };
+  g.innerWidth = 1920; g.innerHeight = 969; g.outerWidth = 1920; g.outerHeight = 1050; g.devicePixelRatio = 2;
+  g.localStorage = storage(); g.sessionStorage = storage();
+  g.addEventListener = on; g.removeEventListener = noop;
+  g.history = { length: 1, state: null, pushState: noop, replaceState: noop, back: noop };
+  g.performance = g.performance || { now: function () { return Date.now(); }, timing: {} };
+  g.setInterval = g.setInterval || function (fn, ms) { return setTimeout(function tick() { fn(); setTimeout(tick, ms); }, ms); };
+  g.btoa = g.btoa || function (s) {
+    var out = "", i = 0, n, a, b, c;
+    while (i < s.length) {
+      a = s.charCodeAt(i++); b = s.charCodeAt(i++); c = s.charCodeAt(i++);
+      n = (a << 16) | ((b || 0) << 8) | (c || 0);
+      out += b64[(n >> 18) & 63] + b64[(n >> 12) & 63] + (isNaN(b) ? "=" : b64[(n >> 6) & 63]) + (isNaN(c) ? "=" : b64[n & 63]);
+    }
+    return out;
+  };
+  g.atob = g.atob || function (s) {
+    var out = "", bits = 0, value = 0, i, idx;
+    s = String(s).replace(/[^A-Za-z0-9+\/]/g, "");
+    for (i = 0; i < s.length; i++) {
+      idx = b64.indexOf(s[i]); value = (value << 6) | idx; bits += 6;
+      if (bits >= 8) { bits -= 8; out += String.fromCharCode((value >> bits) & 255); }
+    }
+    return out;
+  };
+  g.document = {
+    get cookie() {
+      return Object.keys(jar).map(function (k) { return k + "=" + jar[k]; }).join("; ");
+    },
+    set cookie(value) {
+      var text = String(value), pair = text.split(";")[0], i = pair.indexOf("=");
+      if (i <= 0) return;
+      var name = pair.slice(0, i).trim();
+      if (/;\s*max-age\s*=\s*(0|-\d+)\b/i.test(text) || /;\s*expires\s*=[^;]*1970/i.test(text)) delete jar[name];
+      else jar[name] = pair.slice(i + 1).trim();
+    },
+    location: location, URL: config.url, domain: location.hostname, referrer: "", title: "",
+    readyState: "loading", visibilityState: "visible", hidden: false, characterSet: "UTF-8",
+    documentElement: element("html"), head: element("head"), body: element("body"),
+    createElement: element, createTextNode: element, getElementById: function () { return null; },
+    getElementsByTagName: function () { return []; }, getElementsByClassName: function () { return []; },
+    querySelector: function () { return null; }, querySelectorAll: function () { return []; },
+    addEventListener: on, removeEventListener: noop
+  };
+  g.__zpFireLoad = function () {
+    g.document.readyState = "complete";
+    listeners.forEach(function (item) {
+      if (item[0] === "DOMContentLoaded" || item[0] === "load") { try { item[1]({ type: item[0] }); } catch (e) {} }
+    });
+    if (typeof g.onload === "function") { try { g.onload({ type: "load" }); } catch (e) {} }
+  };
+  g.__zpCookies = function () { return JSON.stringify(jar); };
+})(%s);
+"""
 
+# 脚本执行后轮询 Cookie 罐，写入 __zp_stoken__ 或超时后返回 Cookie 罐
+JS_WAIT_STOKEN = r"""
+new Promise(function (resolve) {
+  var deadline = Date.now() + %d;
+  (function poll() {
+    if (/(^|; )__zp_stoken__=/.test(document.cookie) || Date.now() >= deadline) resolve(__zpCookies());
+    else setTimeout(poll, 20);
+  })();
+})
+"""
 
-# 后台线程函数：在独立线程中调用scan接口，不阻塞主线程
-def background_scan_monitor(qr_id: str):
-    """在后台线程中监控扫码状态和确认状态，不阻塞主线程"""
-    try:
-        session = state.get_session()
-        scan_url = f"https://www.zhipin.com/wapi/zppassport/qrcode/scan?uuid={qr_id}"
-        confirm_url = f"https://www.zhipin.com/wapi/zppassport/qrcode/scanLogin?qrId={qr_id}&status=1"
 
-        # 阶段1：等待扫码（长轮询）
-        print(f"[后台监控] 开始监控扫码状态，QR ID: {qr_id}")
-        scan_count = 0
-        while True:
-            if state.login_status.login_step == "logged_in":
-                print(f"[后台监控] 已登录，停止监控")
-                return
+class JsSecurityEngine:
+    """嵌入式 JS 引擎：V8 上下文都在同一个后台线程的事件循环上创建、执行和销毁
 
-            try:
-                scan_count += 1
-                print(f"[后台监控] 第{scan_count}次调用scan接口")
-                resp = session.get(scan_url, timeout=35)
-
-                # 检查响应内容，而不只是状态码
-                if resp.status_code == 200:
-                    json_data = resp.json()
-                    if json_data.get("scaned"):
-                        print(f"[后台监控] ✅ 检测到用户已扫码，进入确认阶段")
-                        state.update_login_status(login_step="scanned")
-                        break  # 退出扫码循环，进入确认阶段
-                    elif json_data.get("msg") == "timeout":
-                        print(f"[后台监控] ⏱️ 等待扫码超时，继续轮询... ({scan_count})")
-                    else:
-                        print(f"[后台监控] 🔄 轮询中... ({scan_count}) - {json_data}")
-                else:
-                    print(f"[后台监控] ⚠️ 未知扫码状态码: {resp.status_code}")
+    mini-racer 在多个线程同时创建或销毁上下文时会崩溃；放在单独的线程上，
+    多个验证仍可在等待页面定时器时交错进行，脚本执行也不占用服务器事件循环
+    """
 
-            except requests.exceptions.ReadTimeout:
-                print(f"[后台监控] ⏱️ 等待扫码超时，继续轮询... ({scan_count})")
-                continue
-            except Exception as e:
-                print(f"[后台监控] ❌ 调用scan接口出错: {e}")
-                time.sleep(2)
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """是否先用 JS 引擎完成安全验证"""
+        return SECURITY_ENGINE != "browser" and JS_ENGINE_AVAILABLE
+
+    def warm(self):
+        """在后台加载 V8，首次验证不必等待"""
+        asyncio.run_coroutine_threadsafe(self._evaluate("about:blank", {}, ["0"]), self._get_loop())
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="boss-zp-js-engine", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def run(self, url: str, cookies: Dict[str, str], scripts: List[str]) -> Dict[str, str]:
+        """依次执行页面脚本，等待写入 __zp_stoken__（或超时）后返回 Cookie 罐"""
+        future = asyncio.run_coroutine_threadsafe(self._evaluate(url, cookies, scripts), self._get_loop())
+        return await asyncio.wrap_future(future)
 
-            time.sleep(1)
+    @staticmethod
+    async def _evaluate(url: str, cookies: Dict[str, str], scripts: List[str]) -> Dict[str, str]:
+        from py_mini_racer import JSEvalException, JSOOMException, MiniRacer
 
-        # 阶段2：等待确认（长轮询）
-        if state.login_status.login_step == "scanned":
-            print(f"[后台监控] 开始监控确认状态")
-            confirm_count = 0
-            while True:
+        timeout = JS_SECURITY_TIMEOUT_MS / 1000
+        ctx = MiniRacer()
+        try:
+            ctx.set_hard_memory_limit(JS_SECURITY_MAX_HEAP_MB * 1024 * 1024)
+            config = {"url": url, "userAgent": DEFAULT_HEADERS["User-Agent"], "cookies": cookies}
+            ctx.eval(JS_BROWSER_SHIM % json.dumps(config, ensure_ascii=False))
+            # 超时会取消 V8 中正在执行的脚本，死循环的脚本不会一直占用引擎
+            for script in scripts:
                 try:
-                    confirm_count += 1
-                    print(f"[后台监控] 第{confirm_count}次调用confirm接口")
-                    resp = session.get(confirm_url, timeout=35)
-
-                    # 检查响应内容
-                    if resp.status_code == 200:
-                        print(f"[后台监控] ✅ 用户已确认登录，获取Cookie")
-
-                        # 获取最终Cookie
-                        i_str = "8048b8676fb7d3d8952276e6e98e0bde.f2dc7a63c4b0fbfa4b51a07e2710cf83.fef7e750fc3a1e6327e8a880915aee9c.ae00f848beb1aa591d71d5a80dd3bd95"
-                        e_b64 = "clRwXUJBK1VKK0k0IWFbbQ=="
-
-                        key_bytes = base64.b64decode(e_b64)
-                        plaintext_bytes = i_str.encode('utf-8')
-                        iv_bytes = get_random_bytes(16)
-                        cipher = AES.new(key_bytes, AES.MODE_CBC, iv_bytes)
-                        padded_plaintext = pad(plaintext_bytes, AES.block_size)
-                        ciphertext_bytes = cipher.encrypt(padded_plaintext)
-                        result_bytes = iv_bytes + ciphertext_bytes
-                        fp = base64.b64encode(result_bytes).decode('utf-8')
-
-                        dispatcher_url = f"https://www.zhipin.com/wapi/zppassport/qrcode/dispatcher?qrId={qr_id}&pk=header-login&fp={fp}"
-                        cookie_resp = session.get(dispatcher_url, allow_redirects=False)
-
-                        # 解析Cookie
-                        set_cookie_headers = cookie_resp.headers.get('Set-Cookie', '')
-                        cookie_str = ''
-                        bst_value = ''
-
-                        if set_cookie_headers:
-                            cookies = {}
-                            cookie_parts = set_cookie_headers.split(',')
-                            for part in cookie_parts:
-                                if '=' in part:
-                                    name_value = part.strip().split(';')[0].strip()
-                                    if '=' in name_value:
-                                        name, value = name_value.split('=', 1)
-                                        cookies[name.strip()] = value.strip()
-
-                            cookie_str = '; '.join([f"{k}={v}" for k, v in cookies.items()])
-                            # if 'wt2' in cookies:
-                            #     cookie_str = f"wt2={cookies['wt2']}"
-                            if 'bst' in cookies:
-                                bst_value = cookies['bst']
-
-                        # 阶段3：使用无头浏览器完成安全验证
-                        print(f"[后台监控] 开始安全验证流程...")
-                        state.update_login_status(login_step="security_check")
-
-                        # 在新的事件循环中运行异步安全验证
-                        try:
-                            # 创建新的事件循环（因为我们在同步线程中）
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-
-                            # 运行安全验证
-                            final_cookie_str = loop.run_until_complete(
-                                BossZhipinAPI.complete_security_check(cookie_str)
-                            )
-
-                            loop.close()
-
-                            print(f"[后台监控] ✅ 安全验证完成")
-
-                            # 使用最终 Cookie 更新 session
-                            for cookie_pair in final_cookie_str.split('; '):
-                                if '=' in cookie_pair:
-                                    name, value = cookie_pair.split('=', 1)
-                                    session.cookies.set(name, value)
-
-                            # 更新状态为最终 Cookie
-                            state.update_login_status(
-                                is_logged_in=True,
-                                cookie=final_cookie_str,
-                                bst=bst_value,
-                                login_step="logged_in"
-                            )
-
-                            print(f"[后台监控] 🎉 登录成功！最终 Cookie 已保存")
-
-                        except Exception as e:
-                            print(f"[后台监控] ⚠️ 安全验证失败，使用初始 Cookie: {e}")
-
-                            # 如果安全验证失败，仍然使用初始 Cookie
-                            if cookie_str:
-                                for cookie_pair in cookie_str.split('; '):
-                                    if '=' in cookie_pair:
-                                        name, value = cookie_pair.split('=', 1)
-                                        session.cookies.set(name, value)
-
-                            state.update_login_status(
-                                is_logged_in=True,
-                                cookie=cookie_str,
-                                bst=bst_value,
-                                login_step="logged_in"
-                            )
-
-                            print(f"[后台监控] 🎉 登录成功！初始 Cookie 已保存")
-
-                        return
-                    else:
-                        # 检查响应内容
-                        json_data = resp.json()
-                        if json_data.get("msg") == "timeout":
-                            print(f"[后台监控] ⏱️ 等待确认超时，继续轮询... ({confirm_count})")
-                        else:
-                            print(f"[后台监控] 🔄 轮询中... ({confirm_count}) - {json_data}")
-
-                except requests.exceptions.ReadTimeout:
-                    print(f"[后台监控] ⏱️ 等待确认超时，继续轮询... ({confirm_count})")
-                    continue
-                except Exception as e:
-                    print(f"[后台监控] ❌ 调用confirm接口出错: {e}")
-                    time.sleep(2)
+                    await asyncio.wait_for(ctx.eval_cancelable(script), timeout=timeout)
+                except JSOOMException:
+                    raise
+                except JSEvalException as e:
+                    # 与浏览器一样，单段脚本出错不影响后续脚本
+                    security_log.debug("安全验证脚本执行出错: %s", e)
+            await asyncio.wait_for(ctx.eval_cancelable("__zpFireLoad()"), timeout=timeout)
+            result = await asyncio.wait_for(ctx.eval(JS_WAIT_STOKEN % JS_SECURITY_TIMEOUT_MS), timeout=timeout + 1)
+            return json.loads(result)
+        finally:
+            ctx.close()
 
-                time.sleep(1)
 
-    except Exception as e:
-        print(f"[后台监控] ❌ 监控线程异常: {e}")
-    finally:
-        print(f"[后台监控] 监控线程结束")
+js_security_engine = JsSecurityEngine()
 
 
 # Boss直聘API工具类
 class BossZhipinAPI:
     """Boss直聘API操作类"""
 
+    # 等待安全验证页面写入 __zp_stoken__ 的最长时间
+    STOKEN_TIMEOUT_MS = 30000
+
+    # 固定的 security-check URL 参数
+    SECURITY_CHECK_URL = (
+        f"{ZHIPIN_BASE_URL}/web/common/security-check.html?"
+        "seed=ttttZij2JIIK%2BxUw73%2B6ZmzsaYKTbDQuIH6OR6Bm54o%3D"
+        "&name=e331459e"
+        "&ts=1762256958405"
+        "&callbackUrl=https%3A%2F%2Fwww.zhipin.com%2Fweb%2Fgeek%2Fjobs"
+    )
+
     @staticmethod
     def generate_fp(i_str: str, e_b64: str) -> str:
         """生成设备指纹参数"""
+        from Crypto.Cipher import AES
+        from Crypto.Util.Padding import pad
+
         key_bytes = base64.b64decode(e_b64)
         plaintext_bytes = i_str.encode('utf-8')
-        iv_bytes = get_random_bytes(16)
+        iv_bytes = os.urandom(16)
 
         cipher = AES.new(key_bytes, AES.MODE_CBC, iv_bytes)
         padded_plaintext = pad(plaintext_bytes, AES.block_size)
@@ -302,151 +3112,175 @@ class BossZhipinAPI:
         return base64.b64encode(result_bytes).decode('utf-8')
 
     @staticmethod
-    async def complete_security_check(initial_cookie: str) -> str:
-        """使用无头浏览器完成安全验证，获取最终 Cookie
+    async def complete_security_check(
+        initial_cookies: Dict[str, str],
+        client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[str, str]:
+        """完成安全验证，获取最终 Cookie；先用嵌入式 JS 引擎执行验证脚本，
+        未拿到 __zp_stoken__ 时改用无头浏览器（配置了工作进程池时在独立进程中执行）
 
         Args:
-            initial_cookie: 从 dispatcher 接口获取的初始 Cookie
+            initial_cookies: 从 dispatcher 接口获取的初始 Cookie
+            client: 账号的 HTTP 客户端，JS 引擎用它获取验证页面和脚本，不传时使用临时客户端
 
         Returns:
-            包含 __zp_stoken__ 的最终 Cookie 字符串
+            包含 __zp_stoken__ 的最终 Cookie，失败时返回初始 Cookie
         """
-        # 固定的 security-check URL 参数
-        security_check_url = (
-            "https://www.zhipin.com/web/common/security-check.html?"
-            "seed=ttttZij2JIIK%2BxUw73%2B6ZmzsaYKTbDQuIH6OR6Bm54o%3D"
-            "&name=e331459e"
-            "&ts=1762256958405"
-            "&callbackUrl=https%3A%2F%2Fwww.zhipin.com%2Fweb%2Fgeek%2Fjobs"
-        )
-
-        print(f"[安全验证] 开始使用无头浏览器完成安全验证")
+        if js_security_engine.enabled:
+            start_time = time.perf_counter()
+            try:
+                final_cookies, result = await BossZhipinAPI.run_security_check_js(initial_cookies, client)
+            except Exception as e:
+                final_cookies, result = initial_cookies, "error"
+                security_log.warning("JS 引擎安全验证失败: %s", e)
+            elapsed = time.perf_counter() - start_time
+            SECURITY_CHECK_SECONDS.observe(elapsed, result=result, engine="js")
+            if result == "ok":
+                security_log.info("安全验证完成（JS 引擎），耗时 %.3fs", elapsed)
+                return final_cookies
+            if SECURITY_ENGINE == "js":
+                return final_cookies
+            security_log.info("JS 引擎未完成安全验证（%s），改用无头浏览器", result)
+        elif SECURITY_ENGINE == "js":
+            security_log.error("未安装 mini-racer，无法使用 JS 引擎完成安全验证")
+            return initial_cookies
+
+        security_log.info("开始使用无头浏览器完成安全验证")
+        start_time = time.perf_counter()
 
         try:
-            async with async_playwright() as p:
-                # 启动无头浏览器
-                browser = await p.chromium.launch(headless=True)
-                context = await browser.new_context()
+            if security_workers.enabled:
+                final_cookies, result = await security_workers.run(initial_cookies)
+            else:
+                final_cookies, result = await BossZhipinAPI.run_security_check(initial_cookies)
+        except Exception as e:
+            SECURITY_CHECK_SECONDS.observe(time.perf_counter() - start_time, result="error", engine="browser")
+            security_log.error("安全验证失败: %s", e)
+            # 如果失败，返回初始 Cookie
+            return initial_cookies
 
-                # 解析并设置初始 Cookie
-                cookies = []
-                for cookie_pair in initial_cookie.split('; '):
-                    if '=' in cookie_pair:
-                        name, value = cookie_pair.split('=', 1)
-                        cookies.append({
-                            'name': name,
-                            'value': value,
-                            'domain': '.zhipin.com',
-                            'path': '/'
-                        })
-
-                await context.add_cookies(cookies)
-                print(f"[安全验证] 已设置初始 Cookie，共 {len(cookies)} 个")
-
-                # 访问 security-check 页面
-                page = await context.new_page()
-                print(f"[安全验证] 正在访问 security-check 页面...")
-                await page.goto(security_check_url, wait_until='domcontentloaded')
-
-                # 等待网络空闲
-                print(f"[安全验证] 等待网络空闲...")
-                try:
-                    await page.wait_for_load_state('networkidle', timeout=30000)
-                    print(f"[安全验证] ✅ 网络已空闲")
-                except Exception as e:
-                    print(f"[安全验证] ⚠️ 等待网络空闲超时: {e}")
-
-                # 额外等待，确保 JS 执行完成并设置 Cookie
-                print(f"[安全验证] 额外等待 3 秒，确保 Cookie 完全设置...")
-                await asyncio.sleep(3)
-
-                # 方法1：通过 JS 直接从页面读取 Cookie
-                print(f"[安全验证] 通过 JavaScript 读取页面 Cookie...")
-                js_cookies = await page.evaluate("() => document.cookie")
-                print(f"[安全验证] JS 获取的 Cookie: {js_cookies[:200]}...")
-
-                # 方法2：通过 Playwright API 获取 Cookie
-                print(f"[安全验证] 通过 Playwright API 获取 Cookie...")
-                final_cookies = await context.cookies()
-                playwright_cookie_str = '; '.join([f"{c['name']}={c['value']}" for c in final_cookies])
-                print(f"[安全验证] Playwright API 获取的 Cookie: {playwright_cookie_str[:200]}...")
-
-                # 使用 JS 读取的 Cookie（这是浏览器中真实的 Cookie）
-                final_cookie_str = js_cookies
-
-                # 检查是否有 __zp_stoken__
-                has_stoken = '__zp_stoken__' in js_cookies
-                if has_stoken:
-                    # 从 Cookie 字符串中提取 __zp_stoken__ 的值
-                    for cookie_pair in js_cookies.split('; '):
-                        if cookie_pair.startswith('__zp_stoken__='):
-                            stoken_value = cookie_pair.split('=', 1)[1]
-                            print(f"[安全验证] ✅ 成功获取 __zp_stoken__: {stoken_value[:20]}...")
-                            break
-                else:
-                    print(f"[安全验证] ⚠️ 未找到 __zp_stoken__")
+        elapsed = time.perf_counter() - start_time
+        SECURITY_CHECK_SECONDS.observe(elapsed, result=result, engine="browser")
+        security_log.info("安全验证完成，结果 %s，耗时 %.2fs", result, elapsed)
+        return final_cookies
 
-                print(f"[安全验证] ✅ 安全验证完成")
+    @staticmethod
+    async def run_security_check(initial_cookies: Dict[str, str]) -> tuple[Dict[str, str], str]:
+        """在本进程的浏览器池中打开安全验证页面，返回 (最终 Cookie, 结果 ok/no_stoken)"""
+        async with browser_pool.context() as context:
+            # 设置初始 Cookie
+            cookies = [
+                {'name': name, 'value': value, 'domain': COOKIE_DOMAIN, 'path': '/'}
+                for name, value in initial_cookies.items()
+            ]
+            await context.add_cookies(cookies)
+            security_log.debug("已设置初始 Cookie，共 %d 个", len(cookies))
 
-                # 关闭浏览器
-                await browser.close()
+            # 访问 security-check 页面
+            # 备用上下文已预先打开页面
+            page = context.pages[0] if context.pages else await context.new_page()
+            await page.goto(BossZhipinAPI.SECURITY_CHECK_URL, wait_until='domcontentloaded')
 
-                return final_cookie_str
+            # 页面 JS 写入 __zp_stoken__ 后立即结束，不再等待网络空闲和固定延时
+            try:
+                await page.wait_for_function(
+                    "() => document.cookie.includes('__zp_stoken__=')",
+                    timeout=BossZhipinAPI.STOKEN_TIMEOUT_MS,
+                    polling=100
+                )
+            except Exception as e:
+                security_log.warning("等待 __zp_stoken__ 超时: %s", e)
 
-        except Exception as e:
-            print(f"[安全验证] ❌ 安全验证失败: {e}")
-            # 如果失败，返回初始 Cookie
-            return initial_cookie
+            # 直接读取浏览器上下文中的 Cookie（包括 HttpOnly），不再解析 document.cookie 字符串
+            final_cookies = {
+                cookie['name']: cookie['value'] for cookie in await context.cookies(ZHIPIN_BASE_URL)
+            }
+
+        # 检查是否有 __zp_stoken__
+        if '__zp_stoken__' in final_cookies:
+            return final_cookies, "ok"
+        security_log.warning("未找到 __zp_stoken__")
+        return final_cookies, "no_stoken"
 
     @staticmethod
-    async def get_randkey(session: requests.Session) -> str:
-        """获取登录随机密钥"""
-        url = "https://www.zhipin.com/wapi/zppassport/captcha/randkey"
-        resp = session.post(url)
-        resp.raise_for_status()
-        return resp.json()["zpData"]["qrId"]
+    async def run_security_check_js(
+        initial_cookies: Dict[str, str],
+        client: Optional[httpx.AsyncClient] = None
+    ) -> tuple[Dict[str, str], str]:
+        """获取安全验证页面及其脚本，在嵌入式 JS 引擎中执行，返回 (最终 Cookie, 结果 ok/no_stoken)"""
+        owned = client is None
+        if owned:
+            client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=httpx.Timeout(10.0))
+        cookies = dict(initial_cookies)
+        try:
+            headers = {"Cookie": format_cookie_header(cookies)}
+            resp = await client.get(BossZhipinAPI.SECURITY_CHECK_URL, headers=headers)
+            resp.raise_for_status()
+            cookies.update(cookies_from_response(resp))
+
+            # 按页面中的顺序收集内联脚本和外部脚本
+            scripts = []
+            for attrs, body in SCRIPT_TAG_RE.findall(resp.text):
+                script_type = SCRIPT_TYPE_RE.search(attrs)
+                if script_type and "javascript" not in script_type.group(1).lower():
+                    continue
+                src = SCRIPT_SRC_RE.search(attrs)
+                if src:
+                    request = client.build_request("GET", urljoin(str(resp.url), html.unescape(src.group(1))), headers=headers)
+                    if not cookie_domain_matches(request.url.host):
+                        # 和浏览器一样，Cookie 只发给所属的域，其他主机（CDN 等）上的脚本不带 Cookie
+                        del request.headers["Cookie"]
+                    script_resp = await client.send(request)
+                    script_resp.raise_for_status()
+                    scripts.append(script_resp.text)
+                elif body.strip():
+                    scripts.append(body)
+        finally:
+            if owned:
+                await client.aclose()
+
+        if not scripts:
+            raise ValueError("安全验证页面中没有脚本")
+        security_log.debug("安全验证页面共 %d 段脚本", len(scripts))
+
+        final_cookies = await js_security_engine.run(str(resp.url), cookies, scripts)
+        if '__zp_stoken__' in final_cookies:
+            return final_cookies, "ok"
+        return final_cookies, "no_stoken"
 
     @staticmethod
-    def get_randkey_sync(session: requests.Session) -> str:
-        """获取登录随机密钥（同步版本）"""
-        url = "https://www.zhipin.com/wapi/zppassport/captcha/randkey"
-        resp = session.post(url)
+    async def get_randkey(client: httpx.AsyncClient) -> str:
+        """获取登录随机密钥"""
+        url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/captcha/randkey"
+        resp = await client.post(url)
         resp.raise_for_status()
         return resp.json()["zpData"]["qrId"]
 
     @staticmethod
-    async def get_qrcode(session: requests.Session, qr_id: str) -> bytes:
+    async def get_qrcode(client: httpx.AsyncClient, qr_id: str) -> bytes:
         """获取二维码图片数据"""
-        url = f"https://www.zhipin.com/wapi/zpweixin/qrcode/getqrcode?content={qr_id}"
-        resp = session.get(url)
-        resp.raise_for_status()
-        return resp.content
-
-    @staticmethod
-    def get_qrcode_sync(session: requests.Session, qr_id: str) -> bytes:
-        """获取二维码图片数据（同步版本）"""
-        url = f"https://www.zhipin.com/wapi/zpweixin/qrcode/getqrcode?content={qr_id}"
-        resp = session.get(url)
+        url = f"{ZHIPIN_BASE_URL}/wapi/zpweixin/qrcode/getqrcode?content={qr_id}"
+        resp = await client.get(url)
         resp.raise_for_status()
         return resp.content
 
     @staticmethod
-    async def check_scan_status(session: requests.Session, qr_id: str) -> int:
+    async def check_scan_status(client: httpx.AsyncClient, qr_id: str) -> int:
         """检查扫码状态"""
-        url = f"https://www.zhipin.com/wapi/zppassport/qrcode/scan?uuid={qr_id}"
-        resp = session.get(url, timeout=60)  # 使用短超时避免长时间阻塞
+        url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/qrcode/scan?uuid={qr_id}"
+        resp = await client.get(url, timeout=60)  # 长轮询接口，单独放宽超时
         return resp.status_code
 
     @staticmethod
-    async def check_login_confirmation(session: requests.Session, qr_id: str) -> int:
+    async def check_login_confirmation(client: httpx.AsyncClient, qr_id: str) -> int:
         """检查登录确认状态"""
-        url = f"https://www.zhipin.com/wapi/zppassport/qrcode/scanLogin?qrId={qr_id}&status=1"
-        resp = session.get(url, timeout=60)  # 使用短超时避免长时间阻塞
+        url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/qrcode/scanLogin?qrId={qr_id}&status=1"
+        resp = await client.get(url, timeout=60)  # 长轮询接口，单独放宽超时
         return resp.status_code
 
     @staticmethod
-    async def get_final_cookie(session: requests.Session, qr_id: str) -> tuple[str, str]:
-        """获取最终登录Cookie"""
+    async def get_final_cookie(client: httpx.AsyncClient, qr_id: str) -> tuple[Dict[str, str], str]:
+        """获取最终登录Cookie，返回 (Cookie, bst)"""
         # 使用与 login_verifier.py 相同的参数和URL
         i_str = "8048b8676fb7d3d8952276e6e98e0bde.f2dc7a63c4b0fbfa4b51a07e2710cf83.fef7e750fc3a1e6327e8a880915aee9c.ae00f848beb1aa591d71d5a80dd3bd95"
         e_b64 = "clRwXUJBK1VKK0k0IWFbbQ=="
@@ -455,44 +3289,36 @@ class BossZhipinAPI:
         fp = BossZhipinAPI.generate_fp(i_str, e_b64)
 
         # 使用正确的 dispatcher URL
-        dispatcher_url = f"https://www.zhipin.com/wapi/zppassport/qrcode/dispatcher?qrId={qr_id}&pk=header-login&fp={fp}"
-        resp = session.get(dispatcher_url, allow_redirects=False)
-
-        # 解析Set-Cookie头
-        set_cookie_headers = resp.headers.get('Set-Cookie', '')
-        cookie_str = ''
-        bst_value = ''
-
-        if set_cookie_headers:
-            # 解析Cookie
-            cookies = {}
-            cookie_parts = set_cookie_headers.split(',')
-            for part in cookie_parts:
-                if '=' in part:
-                    name_value = part.strip().split(';')[0].strip()
-                    if '=' in name_value:
-                        name, value = name_value.split('=', 1)
-                        cookies[name.strip()] = value.strip()
-
-            # 构建cookie字符串
-            cookie_str = '; '.join([f"{k}={v}" for k, v in cookies.items()])
-
-            # 查找特定的cookie值
-            if 'wt2' in cookies:
-                cookie_str = f"wt2={cookies['wt2']}"
-            if 'bst' in cookies:
-                bst_value = cookies['bst']
+        dispatcher_url = f"{ZHIPIN_BASE_URL}/wapi/zppassport/qrcode/dispatcher?qrId={qr_id}&pk=header-login&fp={fp}"
+        resp = await client.get(dispatcher_url, follow_redirects=False)
+
+        # 逐条解析Set-Cookie头，保留全部Cookie
+        cookies = cookies_from_response(resp)
 
         # 设置Cookie到会话
-        if cookie_str:
-            session.headers['Cookie'] = cookie_str
+        if cookies:
+            client.headers['Cookie'] = format_cookie_header(cookies)
 
-        return cookie_str, bst_value
+        return cookies, cookies.get('bst', '')
 
     @staticmethod
-    def setup_api_headers(session: requests.Session, cookie: str, bst: str):
+    async def check_cookie_valid(client: httpx.AsyncClient) -> Optional[bool]:
+        """用轻量的用户信息接口校验 Cookie 是否有效，网络异常时返回 None"""
+        url = f"{ZHIPIN_BASE_URL}/wapi/zpuser/wap/getUserInfo.json"
+        try:
+            resp = await client.get(url, timeout=5)
+            resp.raise_for_status()
+            return resp.json().get("code") == 0
+        except httpx.HTTPError as e:
+            session_log.warning("校验 Cookie 时网络异常: %s", e)
+            return None
+        except ValueError:
+            return False
+
+    @staticmethod
+    def setup_api_headers(client: httpx.AsyncClient, cookie: str, bst: str):
         """设置API请求头"""
-        session.headers.update({
+        client.headers.update({
             'Cookie': cookie,
             'zp_token': bst,
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
@@ -527,9 +3353,18 @@ class BossZhipinAPI:
     }
 
     @staticmethod
-    async def get_job_list(session: requests.Session, params: dict) -> dict:
-        """获取职位列表"""
-        url = "https://www.zhipin.com/wapi/zpgeek/pc/recommend/job/list.json"
+    async def get_job_list(
+        client: httpx.AsyncClient,
+        params: dict,
+        account_id: str = "default",
+        use_cache: bool = True
+    ) -> dict:
+        """获取职位列表
+
+        相同账号和筛选条件的结果会在 job_cache 中缓存一段时间，use_cache=False 时跳过缓存；
+        并发的相同请求只会向上游发出一次
+        """
+        url = f"{ZHIPIN_BASE_URL}/wapi/zpgeek/pc/recommend/job/list.json"
 
         # 转换文本参数为代码
         converted_params = {}
@@ -555,8 +3390,38 @@ class BossZhipinAPI:
             if key in params:
                 default_params[key] = params[key]
 
+        # 缓存键不包含时间戳，同一页同一筛选条件视为同一请求
+        cache_key = (
+            account_id,
+            int(default_params["page"]),
+            int(default_params["pageSize"]),
+            default_params.get("experience"),
+            default_params.get("jobType"),
+            default_params.get("salary"),
+            default_params.get("encryptExpectId")
+        )
+        if use_cache:
+            cached = job_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # 并发的相同请求共享同一次上游调用
+        return await upstream_flights.do(
+            ("job_list",) + cache_key,
+            lambda: BossZhipinAPI._fetch_job_list(client, url, default_params, account_id, cache_key)
+        )
+
+    @staticmethod
+    async def _fetch_job_list(
+        client: httpx.AsyncClient,
+        url: str,
+        params: dict,
+        account_id: str,
+        cache_key: tuple
+    ) -> dict:
+        """请求职位列表，成功的结果写入缓存并在后台写入本地索引"""
         try:
-            resp = session.get(url, params=default_params, timeout=10)
+            resp = await client.get(url, params=params, timeout=10)
             resp.raise_for_status()
 
             data = resp.json()
@@ -567,31 +3432,13 @@ class BossZhipinAPI:
             zp_data = data.get("zpData", {})
             job_list = zp_data.get("jobList", [])
 
-            # 转换为标准格式
-            jobs = []
-            for job in job_list:
-                job_info = {
-                    "securityId": job.get("securityId"),
-                    "encryptBossId": job.get("encryptBossId"),
-                    "jobDegree": job.get("jobDegree"),
-                    "jobName": job.get("jobName"),
-                    "lid": job.get("lid"),
-                    "salaryDesc": job.get("salaryDesc"),
-                    "jobLabels": job.get("jobLabels", []),
-                    "skills": job.get("skills", []),
-                    "jobExperience": job.get("jobExperience"),
-                    "cityName": job.get("cityName"),
-                    "areaDistrict": job.get("areaDistrict"),
-                    "encryptBrandId": job.get("encryptBrandId"),
-                    "brandName": job.get("brandName"),
-                    "brandScaleName": job.get("brandScaleName"),
-                    "industry": job.get("industry"),
-                    "contact": job.get("contact", False),
-                    "showTopPosition": job.get("showTopPosition", False)
-                }
-                jobs.append(job_info)
+            # 转换为 JobInfo，序列化时再输出为接口字段格式
+            jobs = [JobInfo.from_api(job) for job in job_list]
 
-            return {
+            # 后台写入本地职位索引，不阻塞本次请求
+            job_index.upsert_later(account_id, jobs)
+
+            result = {
                 "status": "success",
                 "data": {
                     "hasMore": zp_data.get("hasMore", False),
@@ -599,8 +3446,10 @@ class BossZhipinAPI:
                     "total": len(jobs)
                 }
             }
+            job_cache.set(cache_key, result)
+            return result
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"网络请求失败: {str(e)}"
@@ -612,9 +3461,9 @@ class BossZhipinAPI:
             }
 
     @staticmethod
-    async def greet_boss(session: requests.Session, security_id: str, job_id: str) -> dict:
+    async def greet_boss(client: httpx.AsyncClient, security_id: str, job_id: str) -> dict:
         """向HR发送打招呼"""
-        url = "https://www.zhipin.com/wapi/zpgeek/friend/add.json"
+        url = f"{ZHIPIN_BASE_URL}/wapi/zpgeek/friend/add.json"
 
         params = {
             "securityId": security_id,
@@ -622,7 +3471,7 @@ class BossZhipinAPI:
         }
 
         try:
-            resp = session.get(url, params=params, timeout=10)
+            resp = await client.get(url, params=params, timeout=10)
             resp.raise_for_status()
 
             data = resp.json()
@@ -644,7 +3493,7 @@ class BossZhipinAPI:
                 }
             }
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"网络请求失败: {str(e)}"
@@ -656,20 +3505,56 @@ class BossZhipinAPI:
             }
 
 
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """服务启动时开启登录预热和遗留登录接管，退出时释放后台资源"""
+    login_prewarmer.start()
+    login_watcher.start_adopting()
+    security_workers.start()
+    try:
+        yield {}
+    finally:
+        security_workers.close()
+        login_watcher.stop_adopting()
+        await login_prewarmer.close()
+        await browser_pool.close()
+        # 等排队的写入（登录快照、释放租约）完成后再关闭后端
+        await asyncio.to_thread(shared_state.flush)
+        shared_state.close()
+
+
 # 创建FastMCP服务器实例
 mcp = FastMCP(
     name="Boss直聘 MCP Server",
     host="127.0.0.1",
     port=8000,
-    log_level="info"
+    log_level="info",
+    lifespan=server_lifespan
 )
 
 
 # 静态文件路由
 @mcp.custom_route("/static/{filename:path}", methods=["GET"])
-async def serve_static_file(request: Request) -> FileResponse:
-    """提供静态文件服务"""
+async def serve_static_file(request: Request) -> Response:
+    """提供静态文件服务，二维码图片直接从内存返回"""
     filename = request.path_params["filename"]
+    image = qr_images.get(filename)
+    if image is None and shared_state.shared:
+        # 二维码可能由其他副本生成
+        try:
+            image = await shared_state.run(shared_state.get, f"qr:{filename}")
+        except StateBackendError as e:
+            session_log.warning("读取共享二维码失败: %s", e)
+        if image is not None:
+            qr_images.set(filename, image)
+    if image is not None:
+        # 同一个 qrId 的图片不会变化，允许浏览器在有效期内缓存
+        etag = f'"{hashlib.md5(image).hexdigest()}"'
+        headers = {"Cache-Control": f"private, max-age={int(qr_images.ttl)}", "ETag": etag}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(image, media_type="image/png", headers=headers)
+
     file_path = state.static_dir / filename
 
     if file_path.exists() and file_path.is_file():
@@ -681,15 +3566,96 @@ async def serve_static_file(request: Request) -> FileResponse:
     )
 
 
+def publish_qr_image(account: AccountSession, qr_id: str, image: bytes) -> str:
+    """把二维码图片放入内存存储，返回 /static/ 下的访问URL"""
+    filename = f"qrcode_{qr_id}.png"
+    qr_images.set(filename, image)
+    if shared_state.shared:
+        shared_state.submit(
+            shared_state.set, f"qr:{filename}", image, qr_images.ttl,
+            error="写入共享二维码失败", extra={"account_id": account.account_id}
+        )
+    image_url = f"http://127.0.0.1:8000/static/{filename}"
+    account.update_login_status(image_url=image_url)
+    return image_url
+
+
+def login_info(login_status: LoginStatus) -> Dict[str, Any]:
+    """登录状态的查询结果，已登录时附带 Cookie 和解析后的 Cookie 明细"""
+    result = {
+        "is_logged_in": login_status.is_logged_in,
+        "login_step": login_status.login_step,
+        "qr_id": login_status.qr_id,
+        "image_url": login_status.image_url,
+        "error_message": login_status.error_message,
+        "version": login_status.version
+    }
+    if login_status.login_step == "queued":
+        result["queue_position"] = login_status.queue_position
+        result["expected_wait_seconds"] = login_status.expected_wait_seconds
+    if login_status.is_logged_in:
+        result["cookie"] = login_status.cookie
+        result["bst"] = login_status.bst
+        if login_status.cookies:
+            result["cookies_detail"] = dict(login_status.cookies)
+    return result
+
+
+def qr_image_data_uri(image: bytes) -> str:
+    """二维码图片的 data URI，可直接内嵌在工具返回结果中"""
+    return "data:image/png;base64," + base64.b64encode(image).decode("ascii")
+
+
+# 状态类指标在抓取时读取
+metrics.register(Gauge("boss_zp_sessions", "会话池中的账号数", lambda: len(state.accounts)))
+metrics.register(Gauge(
+    "boss_zp_logged_in_sessions",
+    "会话池中已登录的账号数",
+    lambda: sum(1 for account in list(state.accounts.values()) if account.login_status.is_logged_in)
+))
+metrics.register(Gauge("boss_zp_login_watches_active", "正在进行的登录监控数", lambda: login_watcher.active_count))
+metrics.register(Gauge("boss_zp_logins_admitted_active", "占用登录名额、正在安全验证的登录数", lambda: login_admission.active))
+metrics.register(Gauge("boss_zp_login_queue_depth", "排队等待安全验证的登录数", lambda: login_admission.waiting))
+metrics.register(Gauge("boss_zp_login_rejected_total", "因排队已满或等待超时被拒绝的登录数", lambda: login_admission.rejected, "counter"))
+metrics.register(Gauge("boss_zp_browser_contexts_active", "正在使用的浏览器上下文数", lambda: browser_pool.stats()["active_contexts"]))
+metrics.register(Gauge("boss_zp_security_workers_alive", "存活的安全验证工作进程数", lambda: security_workers.stats()["alive"]))
+metrics.register(Gauge("boss_zp_security_queue_depth", "排队中的安全验证任务数", lambda: security_workers.stats()["queued"]))
+metrics.register(Gauge(
+    "boss_zp_security_worker_restarts_total",
+    "安全验证工作进程因超时、崩溃或内存超限的重启次数",
+    lambda: security_workers.restarts,
+    metric_type="counter"
+))
+metrics.register(Gauge("boss_zp_browser_launches_total", "浏览器进程启动次数", lambda: browser_pool.stats()["launches"], "counter"))
+metrics.register(Gauge("boss_zp_job_cache_hits_total", "职位缓存命中次数", lambda: job_cache.hits, "counter"))
+metrics.register(Gauge("boss_zp_job_cache_misses_total", "职位缓存未命中次数", lambda: job_cache.misses, "counter"))
+metrics.register(Gauge("boss_zp_job_cache_hit_ratio", "职位缓存命中率", lambda: job_cache.stats()["hit_rate"]))
+metrics.register(Gauge("boss_zp_job_cache_entries", "职位缓存条目数", lambda: job_cache.stats()["size"]))
+metrics.register(Gauge("boss_zp_qr_images", "内存中的二维码图片数", lambda: qr_images.stats()["size"]))
+metrics.register(Gauge("boss_zp_upstream_shared_calls_total", "与进行中的相同请求合并的调用次数", lambda: upstream_flights.shared, "counter"))
+metrics.register(Gauge("boss_zp_circuit_open_accounts", "处于熔断状态的账号数", lambda: upstream_guard.open_count))
+metrics.register(Gauge("boss_zp_prewarmed_qr_ready", "预申请好的二维码数", lambda: login_prewarmer.stats()["ready"]))
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def serve_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus 指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Resources 定义
 @mcp.resource("boss-zp://status")
 async def get_server_status() -> str:
     """获取服务器状态"""
+    login_status = (await state.get_account()).login_status
     return json.dumps({
         "server": "Boss直聘 MCP Server",
         "version": "2.0.0",
         "status": "running",
-        "login_status": asdict(state.login_status)
+        "login_status": {**asdict(login_status), "cookie": login_status.cookie},
+        "sessions": state.list_accounts(),
+        "active_login_watches": login_watcher.active_count,
+        "job_cache": job_cache.stats()
     }, ensure_ascii=False, indent=2)
 
 
@@ -713,32 +3679,17 @@ async def get_job_config() -> str:
 @mcp.resource("boss-zp://login/start")
 async def start_login(ctx: Context) -> str:
     """启动登录流程"""
+    account = None
     try:
         await ctx.info("开始启动Boss直聘登录流程")
 
         # 重置登录状态
-        state.reset_login()
-
-        # 获取会话
-        session = state.get_session()
-
-        # 步骤1：获取随机密钥（使用同步方式）
-        qr_id = BossZhipinAPI.get_randkey_sync(session)
-        state.update_login_status(qr_id=qr_id, login_step="qr_generated")
+        account = await state.get_account()
+        await account.reset_login()
 
-        # 步骤2：获取二维码（使用同步方式）
-        qr_image_data = BossZhipinAPI.get_qrcode_sync(session, qr_id)
-
-        # 保存二维码图片
-        filename = f"qrcode_{qr_id}.png"
-        filepath = state.static_dir / filename
-
-        with open(filepath, "wb") as f:
-            f.write(qr_image_data)
-
-        # 生成图片URL
-        image_url = f"http://127.0.0.1:8000/static/{filename}"
-        state.update_login_status(image_url=image_url)
+        # 获取 qrId 和二维码图片
+        qr_id, qr_image_data = await new_login_qr(account)
+        image_url = publish_qr_image(account, qr_id, qr_image_data)
 
         await ctx.info(f"二维码已生成，QR ID: {qr_id}")
 
@@ -753,7 +3704,9 @@ async def start_login(ctx: Context) -> str:
     except Exception as e:
         error_msg = f"启动登录流程失败: {str(e)}"
         await ctx.error(error_msg)
-        state.update_login_status(error_message=error_msg)
+        # 获取会话本身失败时没有可以记录错误的账号
+        if account is not None:
+            account.update_login_status(error_message=error_msg)
 
         return json.dumps({
             "status": "error",
@@ -765,31 +3718,10 @@ async def start_login(ctx: Context) -> str:
 async def get_login_info(ctx: Context) -> str:
     """获取当前登录状态和Cookie信息"""
     try:
-        login_status = state.login_status
-
-        # 构建响应信息
-        result = {
-            "is_logged_in": login_status.is_logged_in,
-            "login_step": login_status.login_step,
-            "qr_id": login_status.qr_id,
-            "image_url": login_status.image_url,
-            "error_message": login_status.error_message
-        }
+        login_status = (await state.get_ready_account()).login_status
+        result = login_info(login_status)
 
-        # 如果已登录，添加Cookie信息
         if login_status.is_logged_in:
-            result["cookie"] = login_status.cookie
-            result["bst"] = login_status.bst
-
-            # 解析Cookie显示详细信息
-            if login_status.cookie:
-                cookies_dict = {}
-                for cookie_pair in login_status.cookie.split('; '):
-                    if '=' in cookie_pair:
-                        name, value = cookie_pair.split('=', 1)
-                        cookies_dict[name] = value
-                result["cookies_detail"] = cookies_dict
-
             await ctx.info("✅ 已登录")
         else:
             await ctx.info(f"⏳ 当前状态: {login_status.login_step}")
@@ -815,7 +3747,8 @@ async def get_recommend_jobs(
 ) -> str:
     """获取推荐职位"""
     try:
-        if not state.login_status.is_logged_in:
+        account = await state.get_ready_account()
+        if not account.login_status.is_logged_in:
             return json.dumps({
                 "error": "未登录",
                 "message": "请先完成登录再获取职位信息"
@@ -823,9 +3756,8 @@ async def get_recommend_jobs(
 
         await ctx.info(f"获取推荐职位: 页码{page}, 经验{experience}, 类型{job_type}, 薪资{salary}")
 
-        session = state.get_session()
         headers = {
-            'Cookie': state.login_status.cookie,
+            'Cookie': account.login_status.cookie,
             'Origin': 'https://www.zhipin.com',
             'Referer': 'https://www.zhipin.com/web/geek/job',
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
@@ -882,44 +3814,56 @@ async def get_recommend_jobs(
 
 # Tools 定义
 @mcp.tool()
-async def login_full_auto(ctx: Context) -> str:
-    """完全自动化登录流程，生成二维码并在后台监控扫码状态（无交互版本）"""
-    try:
-        await ctx.info("开始自动化登录流程")
-
-        # 启动登录并生成二维码
-        session = state.get_session()
-        qr_id = await BossZhipinAPI.get_randkey(session)
-        state.update_login_status(qr_id=qr_id, login_step="qr_generated")
-
-        # 获取二维码
-        qr_image_data = await BossZhipinAPI.get_qrcode(session, qr_id)
+async def login_full_auto(
+    ctx: Context,
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT,
+    include_image: bool = False
+) -> str:
+    """完全自动化登录流程，生成二维码并在后台监控扫码状态（无交互版本）
 
-        # 保存二维码图片
-        filename = f"qrcode_{qr_id}.png"
-        filepath = state.static_dir / filename
+    参数说明：
+    - account_id: 账号标识，不同账号的登录状态互不影响
+    - include_image: 为 True 时在结果中附带二维码图片的 base64 data URI，无需再访问 image_url
 
-        with open(filepath, "wb") as f:
-            f.write(qr_image_data)
+    用户确认后的安全验证同时进行数超过上限时按客户端轮转排队（扫码等待不占名额）；
+    排队已满时直接返回 status=busy 和建议的重试间隔 retry_after_seconds
+    """
+    try:
+        await ctx.info(f"开始自动化登录流程，账号: {account_id}")
+        login_admission.check()
+        account = await state.get_account(account_id)
 
-        # 生成图片URL
-        image_url = f"http://127.0.0.1:8000/static/{filename}"
-        state.update_login_status(image_url=image_url)
+        # 启动登录并生成二维码（开启预热时直接使用预先申请好的二维码）
+        qr_id, qr_image_data = await new_login_qr(account)
+        image_url = publish_qr_image(account, qr_id, qr_image_data)
 
-        # 启动后台线程监控扫码状态，不阻塞主线程
-        monitor_thread = threading.Thread(target=background_scan_monitor, args=(qr_id,), daemon=True)
-        monitor_thread.start()
+        # 在事件循环上启动登录监控任务，不阻塞当前工具调用
+        login_watcher.start(account, qr_id, tenant=client_tenant(ctx))
 
         await ctx.info(f"二维码已生成: {image_url}")
-        await ctx.info("后台监控线程已启动，二维码将保持有效1分钟")
+        await ctx.info(f"后台监控已启动，二维码将保持有效{int(login_watcher.remaining(account))}秒")
 
-        return json.dumps({
+        result = {
             "status": "qr_generated",
             "message": "二维码已生成，后台监控已启动",
+            "account_id": account_id,
             "qr_id": qr_id,
             "image_url": image_url,
             "login_step": "qr_generated",
             "next_action": "请使用Boss直聘APP扫码，后台会自动监控登录状态。可通过 boss-zp://login/info 或 get_login_info_tool 查看登录进度和Cookie"
+        }
+        if include_image:
+            result["image_data_uri"] = qr_image_data_uri(qr_image_data)
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
+    except LoginRejected as e:
+        await ctx.warning(str(e))
+        return json.dumps({
+            "status": "busy",
+            "message": str(e),
+            "account_id": account_id,
+            "retry_after_seconds": math.ceil(e.retry_after),
+            "admission": login_admission.stats()
         }, ensure_ascii=False, indent=2)
 
     except Exception as e:
@@ -932,31 +3876,19 @@ async def login_full_auto(ctx: Context) -> str:
 
 
 @mcp.tool()
-async def login_start_interactive(ctx: Context) -> str:
+async def login_start_interactive(ctx: Context, account_id: str = BossZhipinState.DEFAULT_ACCOUNT) -> str:
     """交互式启动登录流程，引导用户完成扫码和确认"""
     try:
-        await ctx.info("开始交互式登录流程")
+        await ctx.info(f"开始交互式登录流程，账号: {account_id}")
+        account = await state.get_account(account_id)
 
         while True:  # 外层循环处理整个登录流程重试
             while True:  # 内层循环处理重新生成二维码的情况
                 # 步骤1：启动登录并生成二维码
-                session = state.get_session()
-                qr_id = await BossZhipinAPI.get_randkey(session)
-                state.update_login_status(qr_id=qr_id, login_step="qr_generated")
-
-                # 获取二维码
-                qr_image_data = await BossZhipinAPI.get_qrcode(session, qr_id)
-
-                # 保存二维码图片
-                filename = f"qrcode_{qr_id}.png"
-                filepath = state.static_dir / filename
-
-                with open(filepath, "wb") as f:
-                    f.write(qr_image_data)
-
-                # 生成图片URL
-                image_url = f"http://127.0.0.1:8000/static/{filename}"
-                state.update_login_status(image_url=image_url)
+                client = account.get_client()
+                qr_id, qr_image_data = await new_login_qr(account)
+                generation = account.login_generation
+                image_url = publish_qr_image(account, qr_id, qr_image_data)
 
                 # 显示二维码信息
                 await ctx.info("=" * 50)
@@ -980,12 +3912,12 @@ async def login_start_interactive(ctx: Context) -> str:
                 # 如果用户选择重新生成二维码，继续内层循环
                 if scan_result.data == "重新生成二维码":
                     await ctx.info("正在重新生成二维码...")
-                    state.reset_login()
+                    await account.reset_login()
                     continue
 
                 # 步骤3：检查扫码状态
                 await ctx.info("🔍 正在验证扫码状态...")
-                status_code = await BossZhipinAPI.check_scan_status(session, qr_id)
+                status_code = await BossZhipinAPI.check_scan_status(client, qr_id)
 
                 if status_code == 200:
                     scan_check = {"status": "scanned"}
@@ -1009,7 +3941,7 @@ async def login_start_interactive(ctx: Context) -> str:
                         }, ensure_ascii=False, indent=2)
 
                     if retry_result.data == "重新扫码":
-                        state.reset_login()
+                        await account.reset_login()
                         continue
 
                 # 扫码成功，退出内层循环
@@ -1032,18 +3964,23 @@ async def login_start_interactive(ctx: Context) -> str:
                 await ctx.info(f"{message} ({i+1}/60秒)")
 
                 # 检查登录确认状态
-                confirm_status_code = await BossZhipinAPI.check_login_confirmation(session, qr_id)
+                confirm_status_code = await BossZhipinAPI.check_login_confirmation(client, qr_id)
 
                 if confirm_status_code == 200:
                     # 获取最终Cookie
-                    cookie_str, bst_value = await BossZhipinAPI.get_final_cookie(session, qr_id)
+                    cookies, bst_value = await BossZhipinAPI.get_final_cookie(client, qr_id)
 
-                    state.update_login_status(
+                    if not account.update_login_status(
+                        generation,
                         is_logged_in=True,
-                        cookie=cookie_str,
+                        cookies=cookies,
                         bst=bst_value,
                         login_step="logged_in"
-                    )
+                    ):
+                        return json.dumps({
+                            "status": "superseded",
+                            "message": "该账号已开始新的登录流程，本次登录结果已丢弃"
+                        }, ensure_ascii=False, indent=2)
 
                     confirm_result = {
                         "status": "logged_in",
@@ -1074,7 +4011,7 @@ async def login_start_interactive(ctx: Context) -> str:
 
                     if retry_result.action == "accept" and retry_result.data == "重新登录":
                         # 重置状态并重新开始外层循环
-                        state.reset_login()
+                        await account.reset_login()
                         await ctx.info("重新开始登录流程...")
                         break  # 退出当前确认等待，重新开始整个流程
                     else:
@@ -1093,7 +4030,7 @@ async def login_start_interactive(ctx: Context) -> str:
 
                 if timeout_result.action == "accept" and timeout_result.data == "重新登录":
                     # 重置状态并重新开始外层循环
-                    state.reset_login()
+                    await account.reset_login()
                     await ctx.info("重新开始登录流程...")
                     continue  # 重新开始整个流程
                 else:
@@ -1112,34 +4049,13 @@ async def login_start_interactive(ctx: Context) -> str:
 
 
 @mcp.tool()
-async def get_login_info_tool(ctx: Context) -> str:
+async def get_login_info_tool(ctx: Context, account_id: str = BossZhipinState.DEFAULT_ACCOUNT) -> str:
     """获取当前登录状态和Cookie信息的工具"""
     try:
-        login_status = state.login_status
+        login_status = (await state.get_ready_account(account_id)).login_status
+        result = login_info(login_status)
 
-        # 构建响应信息
-        result = {
-            "is_logged_in": login_status.is_logged_in,
-            "login_step": login_status.login_step,
-            "qr_id": login_status.qr_id,
-            "image_url": login_status.image_url,
-            "error_message": login_status.error_message
-        }
-
-        # 如果已登录，添加Cookie信息
         if login_status.is_logged_in:
-            result["cookie"] = login_status.cookie
-            result["bst"] = login_status.bst
-
-            # 解析Cookie显示详细信息
-            if login_status.cookie:
-                cookies_dict = {}
-                for cookie_pair in login_status.cookie.split('; '):
-                    if '=' in cookie_pair:
-                        name, value = cookie_pair.split('=', 1)
-                        cookies_dict[name] = value
-                result["cookies_detail"] = cookies_dict
-
             await ctx.info("✅ 已登录，Cookie信息已返回")
         else:
             await ctx.info(f"⏳ 当前状态: {login_status.login_step}")
@@ -1155,13 +4071,89 @@ async def get_login_info_tool(ctx: Context) -> str:
         }, ensure_ascii=False, indent=2)
 
 
+# 正常登录流程中各阶段的先后顺序，用于判断是否已到达目标阶段和上报进度
+LOGIN_STEPS = ["idle", "qr_generated", "scanned", "confirmed", "queued", "security_check", "logged_in"]
+
+
+@mcp.tool()
+async def wait_for_login_step_tool(
+    ctx: Context,
+    target_step: str = "logged_in",
+    timeout: float = 120.0,
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT
+) -> str:
+    """等待登录进行到指定阶段（或之后的阶段），期间每次阶段变化都会通过进度通知推送
+
+    参数说明：
+    - target_step: 目标阶段，可选 qr_generated、scanned、confirmed、queued、security_check、logged_in
+    - timeout: 最长等待秒数
+    - account_id: 账号标识
+
+    排队等待安全验证（queued）时结果中带 queue_position 和 expected_wait_seconds，排队位置变化也会推送进度
+    """
+    if target_step not in LOGIN_STEPS:
+        return json.dumps({
+            "status": "error",
+            "message": f"未知的登录阶段: {target_step}，可选: {', '.join(LOGIN_STEPS[1:])}"
+        }, ensure_ascii=False, indent=2)
+
+    account = await state.get_account(account_id)
+    target = LOGIN_STEPS.index(target_step)
+    start = time.monotonic()
+    deadline = start + max(0.0, timeout)
+    last_reported = None
+
+    # 阶段变化由登录监控任务推送，这里只在变化时被唤醒
+    while True:
+        # 上报进度时会让出事件循环，阶段可能在此期间变化，所以等待的是读阶段之前取得的事件
+        changed = account.step_event
+        login_status = account.login_status
+        step = login_status.login_step
+        if (step, login_status.queue_position) != last_reported:
+            last_reported = (step, login_status.queue_position)
+            progress = LOGIN_STEPS.index(step) if step in LOGIN_STEPS else 0
+            message = step
+            if step == "queued":
+                message = (
+                    f"queued: 第 {login_status.queue_position} 位，"
+                    f"预计等待 {login_status.expected_wait_seconds:.0f} 秒"
+                )
+            await ctx.report_progress(progress=progress, total=len(LOGIN_STEPS) - 1, message=message)
+
+        if step in LOGIN_STEPS and LOGIN_STEPS.index(step) >= target:
+            status = "reached"
+            break
+        if step in ("expired", "failed"):
+            status = step
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            status = "timeout"
+            break
+        if shared_state.shared:
+            # 登录可能由其他副本推进，本地没有推送时每秒读取一次共享状态
+            await account.wait_for_step_change(changed, min(remaining, 1.0))
+            await account.refresh_shared()
+        elif not await account.wait_for_step_change(changed, remaining):
+            status = "timeout"
+            break
+
+    result = login_info(account.login_status)
+    result["status"] = status
+    result["waited_seconds"] = round(time.monotonic() - start, 2)
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+
 @mcp.tool()
 async def get_recommend_jobs_tool(
     ctx: Context,
     page: int = 1,
     experience: str = "不限",
     job_type: str = "全职",
-    salary: str = "不限"
+    salary: str = "不限",
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT,
+    refresh: bool = False,
+    pretty: bool = False
 ) -> str:
     """获取推荐职位工具
 
@@ -1170,11 +4162,15 @@ async def get_recommend_jobs_tool(
     - experience: 工作经验，可选值：在校生、应届生、不限、一年以内、一到三年、三到五年、五到十年、十年以上
     - job_type: 工作类型，可选值：全职、兼职
     - salary: 薪资范围，可选值：3k以下、3-5k、5-10k、10-20k、20-50k、50以上
+    - account_id: 账号标识
+    - refresh: 为 True 时跳过缓存，强制从服务器获取最新数据
+    - pretty: 为 True 时返回缩进格式的 JSON，默认紧凑格式
     """
     await ctx.info(f"调用获取推荐职位工具: 页码{page}")
 
     try:
-        if not state.login_status.is_logged_in:
+        account = await state.get_ready_account(account_id)
+        if not account.login_status.is_logged_in:
             return json.dumps({
                 "error": "未登录",
                 "message": "请先完成登录再获取职位信息"
@@ -1182,9 +4178,9 @@ async def get_recommend_jobs_tool(
 
         await ctx.info(f"获取推荐职位: 页码{page}, 经验{experience}, 类型{job_type}, 薪资{salary}")
 
-        # 获取session并设置API请求头
-        session = state.get_session()
-        BossZhipinAPI.setup_api_headers(session, state.login_status.cookie, state.login_status.bst)
+        # 获取异步客户端并设置API请求头
+        client = account.get_client()
+        BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, account.login_status.bst)
 
         # 构造API参数
         params = {
@@ -1195,11 +4191,11 @@ async def get_recommend_jobs_tool(
         }
 
         # 调用真实的API
-        result = await BossZhipinAPI.get_job_list(session, params)
+        result = await BossZhipinAPI.get_job_list(client, params, account_id=account.account_id, use_cache=not refresh)
 
         if result["status"] == "success":
             await ctx.info(f"成功获取 {result['data']['total']} 个职位")
-            return json.dumps(result, ensure_ascii=False, indent=2)
+            return dumps_json(result, pretty=pretty)
         else:
             await ctx.error(f"获取职位失败: {result['message']}")
             return json.dumps({
@@ -1216,16 +4212,182 @@ async def get_recommend_jobs_tool(
         }, ensure_ascii=False, indent=2)
 
 
+@mcp.tool()
+async def crawl_recommend_jobs_tool(
+    ctx: Context,
+    experience: str = "不限",
+    job_type: str = "全职",
+    salary: str = "不限",
+    start_page: int = 1,
+    max_pages: int = 20,
+    max_jobs: int = 300,
+    include_jobs: bool = True,
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT,
+    refresh: bool = False,
+    pretty: bool = False
+) -> str:
+    """连续获取多页推荐职位，直到没有更多数据或达到上限
+
+    每获取一页就通过进度通知和日志消息（extra 中附带本页职位）推送给客户端，
+    处理当前页的同时预取下一页。
+
+    参数说明：
+    - experience / job_type / salary: 同 get_recommend_jobs_tool
+    - start_page: 起始页码
+    - max_pages: 最多获取的页数
+    - max_jobs: 最多获取的职位数
+    - include_jobs: 为 False 时最终结果只返回汇总，职位仅通过推送获取
+    - account_id: 账号标识
+    - refresh: 为 True 时跳过缓存
+    - pretty: 为 True 时返回缩进格式的 JSON，默认紧凑格式
+    """
+    try:
+        account = await state.get_ready_account(account_id)
+        if not account.login_status.is_logged_in:
+            return json.dumps({
+                "error": "未登录",
+                "message": "请先完成登录再获取职位信息"
+            }, ensure_ascii=False, indent=2)
+
+        await ctx.info(f"开始批量获取推荐职位: 从第{start_page}页起，最多{max_pages}页/{max_jobs}个职位")
+
+        client = account.get_client()
+        BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, account.login_status.bst)
+        base_params = {
+            "experience": experience,
+            "jobType": job_type,
+            "salary": salary
+        }
+
+        def fetch(page_no: int) -> asyncio.Task:
+            return asyncio.create_task(BossZhipinAPI.get_job_list(
+                client, {**base_params, "page": page_no},
+                account_id=account.account_id, use_cache=not refresh
+            ))
+
+        jobs = []
+        pages_fetched = 0
+        has_more = True
+        error_message = None
+        page = start_page
+        pending = fetch(page)
+        try:
+            while pending is not None:
+                result = await pending
+                pending = None
+
+                if result["status"] != "success":
+                    error_message = result["message"]
+                    await ctx.error(f"获取第{page}页失败: {error_message}")
+                    break
+
+                data = result["data"]
+                has_more = data["hasMore"]
+                pages_fetched += 1
+
+                # 先发起下一页请求，再处理当前页
+                if has_more and pages_fetched < max_pages and len(jobs) + data["total"] < max_jobs:
+                    pending = fetch(page + 1)
+
+                page_jobs = data["jobList"][:max_jobs - len(jobs)]
+                jobs.extend(page_jobs)
+                await ctx.report_progress(progress=len(jobs), total=max_jobs, message=f"已获取第{page}页，共{len(jobs)}个职位")
+                await ctx.info(f"第{page}页: {len(page_jobs)}个职位", extra={"page": page, "jobs": [job.to_dict() for job in page_jobs]})
+                page += 1
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        await ctx.info(f"批量获取完成: {pages_fetched}页，{len(jobs)}个职位")
+
+        result = {
+            "status": "success" if error_message is None else "partial",
+            "data": {
+                "pages": pages_fetched,
+                "lastPage": page - 1,
+                "hasMore": has_more,
+                "total": len(jobs)
+            }
+        }
+        if error_message is not None:
+            result["message"] = error_message
+        if include_jobs:
+            result["data"]["jobList"] = jobs
+        return dumps_json(result, pretty=pretty)
+
+    except Exception as e:
+        error_msg = f"批量获取职位失败: {str(e)}"
+        await ctx.error(error_msg)
+        return json.dumps({
+            "error": "批量获取职位失败",
+            "message": error_msg
+        }, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def search_local_jobs_tool(
+    ctx: Context,
+    keyword: str = "",
+    city: str = "",
+    brand_scale: str = "",
+    skills: List[str] = [],
+    min_salary_k: int = 0,
+    max_salary_k: int = 0,
+    account_id: str = "",
+    limit: int = 20,
+    pretty: bool = False
+) -> str:
+    """在本地职位索引中筛选已获取过的职位，不访问 Boss直聘
+
+    参数说明：
+    - keyword: 关键词，匹配职位名、公司、行业、城市、技能和标签，多个词用空格分隔
+    - city: 城市，如 北京
+    - brand_scale: 公司规模，如 100-499人
+    - skills: 必须包含的技能列表
+    - min_salary_k / max_salary_k: 期望薪资范围（单位K），0 表示不限
+    - account_id: 只查该账号获取到的职位，留空查全部
+    - limit: 返回数量上限
+    - pretty: 为 True 时返回缩进格式的 JSON，默认紧凑格式
+    """
+    try:
+        start_time = time.perf_counter()
+        jobs = await asyncio.to_thread(
+            job_index.search,
+            keyword=keyword, city=city, brand_scale=brand_scale, skills=skills,
+            min_salary=min_salary_k, max_salary=max_salary_k, account_id=account_id, limit=limit
+        )
+        took_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        await ctx.info(f"本地索引查询到 {len(jobs)} 个职位，耗时 {took_ms}ms")
+        return dumps_json({
+            "status": "success",
+            "data": {
+                "total": len(jobs),
+                "took_ms": took_ms,
+                "jobList": jobs
+            }
+        }, pretty=pretty)
+
+    except Exception as e:
+        error_msg = f"查询本地职位失败: {str(e)}"
+        await ctx.error(error_msg)
+        return json.dumps({
+            "error": "查询本地职位失败",
+            "message": error_msg
+        }, ensure_ascii=False, indent=2)
+
+
 @mcp.tool()
 async def send_greeting_tool(
     ctx: Context,
     security_id: str,
     job_id: str,
-    message: str = "您好，我对这个职位很感兴趣，希望可以进一步沟通"
+    message: str = "您好，我对这个职位很感兴趣，希望可以进一步沟通",
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT
 ) -> str:
     """发送打招呼工具"""
     try:
-        if not state.login_status.is_logged_in:
+        account = await state.get_ready_account(account_id)
+        if not account.login_status.is_logged_in:
             return json.dumps({
                 "error": "未登录",
                 "message": "请先完成登录再发送打招呼"
@@ -1233,14 +4395,16 @@ async def send_greeting_tool(
 
         await ctx.info(f"发送打招呼到职位 {job_id}")
 
-        # 获取session并设置API请求头
-        session = state.get_session()
-        BossZhipinAPI.setup_api_headers(session, state.login_status.cookie, state.login_status.bst)
+        # 获取异步客户端并设置API请求头
+        client = account.get_client()
+        BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, account.login_status.bst)
 
         # 调用真实的API
-        result = await BossZhipinAPI.greet_boss(session, security_id, job_id)
+        result = await BossZhipinAPI.greet_boss(client, security_id, job_id)
 
         if result["status"] == "success":
+            greeting_record.add(account.account_id, job_id)
+            greeting_record.save()
             await ctx.info(f"打招呼发送成功: {job_id}")
             return json.dumps(result, ensure_ascii=False, indent=2)
         else:
@@ -1259,11 +4423,127 @@ async def send_greeting_tool(
         }, ensure_ascii=False, indent=2)
 
 
+@mcp.tool()
+async def batch_greeting_tool(
+    ctx: Context,
+    items: List[GreetingRequest],
+    concurrency: int = 3,
+    rate_per_second: float = 1.0,
+    skip_greeted: bool = True,
+    account_id: str = BossZhipinState.DEFAULT_ACCOUNT
+) -> str:
+    """批量向多个职位打招呼
+
+    参数说明：
+    - items: 职位列表，每项包含 security_id 和 job_id
+    - concurrency: 同时进行的请求数上限
+    - rate_per_second: 每秒最多发送的打招呼次数
+    - skip_greeted: 跳过本地记录中已经打过招呼的职位
+    - account_id: 账号标识
+    """
+    try:
+        account = await state.get_ready_account(account_id)
+        if not account.login_status.is_logged_in:
+            return json.dumps({
+                "error": "未登录",
+                "message": "请先完成登录再发送打招呼"
+            }, ensure_ascii=False, indent=2)
+
+        client = account.get_client()
+        BossZhipinAPI.setup_api_headers(client, account.login_status.cookie, account.login_status.bst)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        to_send = []
+        seen = set()
+        for index, item in enumerate(items):
+            if item.job_id in seen or (skip_greeted and greeting_record.has(account.account_id, item.job_id)):
+                results[index] = {"job_id": item.job_id, "status": "skipped", "message": "已打过招呼"}
+            else:
+                seen.add(item.job_id)
+                to_send.append(index)
+
+        await ctx.info(f"批量打招呼: 共{len(items)}个，需发送{len(to_send)}个，跳过{len(items) - len(to_send)}个")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        bucket = TokenBucket(rate=max(rate_per_second, 0.01))
+        done = 0
+
+        async def send(index: int):
+            nonlocal done
+            item = items[index]
+            async with semaphore:
+                await bucket.acquire()
+                result = await BossZhipinAPI.greet_boss(client, item.security_id, item.job_id)
+            if result["status"] == "success":
+                greeting_record.add(account.account_id, item.job_id)
+                results[index] = {"job_id": item.job_id, "status": "success", "data": result["data"]}
+            else:
+                results[index] = {"job_id": item.job_id, "status": "error", "message": result["message"]}
+            done += 1
+            await ctx.report_progress(progress=done, total=len(to_send), message=f"{item.job_id}: {results[index]['status']}")
+
+        try:
+            await asyncio.gather(*(send(index) for index in to_send))
+        finally:
+            greeting_record.save()
+
+        summary = {
+            status: sum(1 for r in results if r["status"] == status)
+            for status in ("success", "error", "skipped")
+        }
+        await ctx.info(f"批量打招呼完成: 成功{summary['success']}个，失败{summary['error']}个，跳过{summary['skipped']}个")
+
+        return json.dumps({
+            "status": "success",
+            "summary": summary,
+            "results": results
+        }, ensure_ascii=False, indent=2)
+
+    except Exception as e:
+        error_msg = f"批量打招呼失败: {str(e)}"
+        await ctx.error(error_msg)
+        return json.dumps({
+            "error": "批量打招呼失败",
+            "message": error_msg
+        }, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def list_sessions_tool(ctx: Context) -> str:
+    """列出会话池中的所有账号及其登录状态"""
+    sessions = state.list_accounts()
+    await ctx.info(f"当前会话数: {len(sessions)}")
+    return json.dumps({
+        "max_sessions": state.max_sessions,
+        "total": len(sessions),
+        "stored_accounts": await shared_state.run(state.store.account_ids),
+        "active_login_watches": login_watcher.active_count,
+        "sessions": sessions
+    }, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def logout_tool(ctx: Context, account_id: str = BossZhipinState.DEFAULT_ACCOUNT) -> str:
+    """退出指定账号并释放其会话"""
+    removed = await state.remove_account(account_id)
+    await ctx.info(f"账号 {account_id} {'已退出' if removed else '不存在'}")
+    return json.dumps({
+        "status": "success" if removed else "not_found",
+        "account_id": account_id
+    }, ensure_ascii=False, indent=2)
+
+
 # 主程序入口
-if __name__ == "__main__":
+if __name__ == "__main__" and SecurityCheckWorkerPool.WORKER_FLAG in sys.argv:
+    asyncio.run(security_check_worker_main())
+elif __name__ == "__main__":
     print("启动 Boss 直聘 MCP Server...")
     print("访问 http://127.0.0.1:8000/mcp 连接到MCP服务器")
     print("访问 http://127.0.0.1:8000/static/ 查看静态文件")
 
+    stored_accounts = state.store.account_ids()
+    if stored_accounts:
+        print(f"发现 {len(stored_accounts)} 个已保存的账号会话，将在首次使用时恢复并校验")
+
     # 运行FastMCP服务器
     mcp.run(transport="streamable-http")
\ No newline at end of file
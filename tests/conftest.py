@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 服务模块在导入时读取这些配置，必须在导入之前指向临时目录
+_tmp = tempfile.mkdtemp(prefix="boss-zp-tests-")
+os.environ["BOSS_ZP_STORE_DIR"] = os.path.join(_tmp, "store")
+os.environ["BOSS_ZP_JOB_INDEX"] = os.path.join(_tmp, "jobs.db")
+os.environ["BOSS_ZP_GREETED_FILE"] = os.path.join(_tmp, "greeted.json")
+os.environ["BOSS_ZP_STATE_BACKEND"] = "memory"
+os.environ.setdefault("BOSS_ZP_LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture(scope="session")
+def server():
+    import boss_zhipin_fastmcp_v2
+
+    return boss_zhipin_fastmcp_v2
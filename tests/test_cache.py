@@ -0,0 +1,90 @@
+"""TTLCache 过期和 LRU 淘汰，SingleFlight 合并并发调用"""
+
+import asyncio
+import time
+
+import pytest
+
+
+def test_ttl_cache_expires_entries(server):
+    cache = server.TTLCache(ttl=0.05, max_size=4)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_cache_evicts_least_recently_used(server):
+    cache = server.TTLCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_invalidate_by_predicate(server):
+    cache = server.TTLCache(ttl=60, max_size=8)
+    for key in (("acc-1", 1), ("acc-1", 2), ("acc-2", 1)):
+        cache.set(key, key)
+    assert cache.invalidate(lambda key: key[0] == "acc-1") == 2
+    assert cache.get(("acc-2", 1)) == ("acc-2", 1)
+
+
+def test_single_flight_shares_one_call(server):
+    async def run():
+        flights = server.SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+        return results, calls, flights
+
+    results, calls, flights = asyncio.run(run())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flights.shared == 4
+    assert flights.in_flight == 0
+
+
+def test_single_flight_propagates_errors_to_all_callers(server):
+    async def run():
+        flights = server.SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        return await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True), flights
+
+    results, flights = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.in_flight == 0
+
+
+def test_single_flight_caller_cancel_does_not_cancel_others(server):
+    async def run():
+        flights = server.SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        first = asyncio.create_task(flights.do("key", fetch))
+        second = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "result"
@@ -0,0 +1,153 @@
+"""登录准入控制：名额、按租户轮转排队、队列上限和排队超时"""
+
+import asyncio
+
+import pytest
+
+
+def test_grants_immediately_below_capacity(server):
+    async def run():
+        admission = server.LoginAdmission(capacity=2, max_queue=4, queue_timeout=1)
+        slots = [await admission.acquire(f"acc-{i}", "t") for i in range(2)]
+        assert admission.active == 2
+        for slot in slots:
+            admission.release(slot)
+        return admission
+
+    admission = asyncio.run(run())
+    assert admission.active == 0
+    assert admission.admitted == 2
+
+
+def test_waiters_are_admitted_round_robin_across_tenants(server):
+    async def run():
+        admission = server.LoginAdmission(capacity=1, max_queue=8, queue_timeout=5)
+        first = await admission.acquire("holder", "a")
+        order = []
+        positions = {}
+
+        async def login(account_id, tenant):
+            def on_queued(position, expected_wait):
+                positions.setdefault(account_id, []).append(position)
+
+            slot = await admission.acquire(account_id, tenant, on_queued)
+            order.append(account_id)
+            await asyncio.sleep(0)
+            admission.release(slot)
+
+        # 租户 a 先排了三个，租户 b 后来只排一个，也不必等 a 全部完成
+        tasks = []
+        for account_id, tenant in (("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")):
+            tasks.append(asyncio.create_task(login(account_id, tenant)))
+            await asyncio.sleep(0)
+        assert admission.waiting == 4
+        queued = {account_id: history[-1] for account_id, history in positions.items()}
+        admission.release(first)
+        await asyncio.gather(*tasks)
+        return order, queued, positions, admission
+
+    order, queued, positions, admission = asyncio.run(run())
+    assert order == ["a1", "b1", "a2", "a3"]
+    # b1 后到，但排在 a 的第二个之前
+    assert queued == {"a1": 1, "b1": 2, "a2": 3, "a3": 4}
+    # 前面的登录放行后，等待者收到前移后的位置
+    assert positions["a3"][-1] == 1
+    assert admission.waiting == 0
+    assert admission.active == 0
+
+
+def test_full_queue_rejects_before_login_starts(server):
+    async def run():
+        admission = server.LoginAdmission(capacity=1, max_queue=1, queue_timeout=5)
+        slot = await admission.acquire("holder", "a")
+        waiter = asyncio.create_task(admission.acquire("queued", "a"))
+        await asyncio.sleep(0)
+        with pytest.raises(server.LoginRejected) as rejected:
+            admission.check()
+        admission.release(slot)
+        admission.release(await waiter)
+        return rejected.value, admission
+
+    rejected, admission = asyncio.run(run())
+    assert rejected.retry_after > 0
+    assert admission.rejected == 1
+
+
+def test_queue_timeout_raises_and_frees_the_place(server):
+    async def run():
+        admission = server.LoginAdmission(capacity=1, max_queue=4, queue_timeout=0.05)
+        slot = await admission.acquire("holder", "a")
+        with pytest.raises(server.LoginRejected):
+            await admission.acquire("late", "b")
+        assert admission.waiting == 0
+        admission.release(slot)
+        return admission
+
+    admission = asyncio.run(run())
+    assert admission.active == 0
+
+
+def test_expected_wait_scales_with_position(server):
+    admission = server.LoginAdmission(capacity=2, max_queue=4, queue_timeout=1)
+    admission.avg_hold = 10.0
+    assert admission.expected_wait(0) == 0.0
+    assert admission.expected_wait(1) == 10.0
+    assert admission.expected_wait(2) == 10.0
+    assert admission.expected_wait(3) == 20.0
+
+
+def test_finish_login_reports_queue_position_on_login_status(server, monkeypatch):
+    admission = server.LoginAdmission(capacity=1, max_queue=4, queue_timeout=5)
+    monkeypatch.setattr(server, "login_admission", admission)
+
+    async def final_cookie(client, qr_id):
+        return {"wt2": "w", "bst": "b"}, "b"
+
+    async def security_check(cookies, client=None):
+        return {**cookies, "__zp_stoken__": "t"}
+
+    async def save_account(account):
+        pass
+
+    monkeypatch.setattr(server.BossZhipinAPI, "get_final_cookie", staticmethod(final_cookie))
+    monkeypatch.setattr(server.BossZhipinAPI, "complete_security_check", staticmethod(security_check))
+    monkeypatch.setattr(server.state, "save_account", save_account)
+
+    async def run():
+        account = server.AccountSession("queued-login")
+        generation = await account.begin_login("qr-1")
+        account.update_login_status(generation, login_step="confirmed")
+        holder = await admission.acquire("holder", "other")
+        finish = asyncio.create_task(server._finish_login(account, "qr-1", generation, "tenant"))
+        await asyncio.sleep(0)
+        queued = server.login_info(account.login_status)
+        queued_eta = admission.expected_wait(1)
+        admission.release(holder)
+        await finish
+        await account.close()
+        return queued, queued_eta, account.login_status
+
+    queued, queued_eta, status = asyncio.run(run())
+    assert queued["login_step"] == "queued"
+    assert queued["queue_position"] == 1
+    assert queued["expected_wait_seconds"] == queued_eta
+    assert status.login_step == "logged_in"
+    assert status.queue_position is None
+    assert status.cookies["__zp_stoken__"] == "t"
+
+
+def test_capacity_follows_security_check_capacity(server, monkeypatch):
+    monkeypatch.setattr(server, "SECURITY_ENGINE", "auto")
+    monkeypatch.setattr(server.browser_pool, "max_contexts", 4)
+    monkeypatch.setattr(server.security_workers, "size", 0)
+    assert server.LoginAdmission().capacity == 4
+    # 配置得更大也不超过浏览器池，配置得更小时以配置为准
+    assert server.LoginAdmission(capacity=32).capacity == 4
+    assert server.LoginAdmission(capacity=2).capacity == 2
+
+    monkeypatch.setattr(server.security_workers, "size", 3)
+    assert server.LoginAdmission().capacity == 3
+
+    monkeypatch.setattr(server, "SECURITY_ENGINE", "js")
+    assert server.LoginAdmission().capacity == server.LoginAdmission.JS_ONLY_CAPACITY
+    assert server.LoginAdmission(capacity=100).capacity == 100
@@ -0,0 +1,102 @@
+"""登录状态机：阶段转换、登录代数和阶段变化通知"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def account(server):
+    return server.AccountSession("state-machine")
+
+
+def test_full_login_path(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        for step in ("scanned", "confirmed", "queued", "security_check"):
+            assert account.update_login_status(generation, login_step=step)
+        assert account.update_login_status(
+            generation, is_logged_in=True, cookies={"wt2": "w", "bst": "b"}, login_step="logged_in"
+        )
+
+    asyncio.run(run())
+    assert account.login_status.login_step == "logged_in"
+    assert account.login_status.is_logged_in
+    assert account.login_status.cookie == "wt2=w; bst=b"
+
+
+def test_illegal_transition_is_rejected(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        assert not account.update_login_status(generation, login_step="security_check")
+        assert account.update_login_status(generation, login_step="expired")
+        # 终态之后不能再转换
+        assert not account.update_login_status(generation, login_step="scanned")
+
+    asyncio.run(run())
+    assert account.login_status.login_step == "expired"
+
+
+def test_stale_generation_cannot_overwrite_new_login(account):
+    async def run():
+        old = await account.begin_login("qr-old")
+        new = await account.begin_login("qr-new")
+        assert not account.update_login_status(old, login_step="scanned")
+        assert account.update_login_status(new, login_step="scanned")
+
+    asyncio.run(run())
+    assert account.login_status.qr_id == "qr-new"
+    assert account.login_status.login_step == "scanned"
+
+
+def test_reset_login_invalidates_running_generation(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        await account.reset_login()
+        assert not account.update_login_status(generation, login_step="scanned")
+
+    asyncio.run(run())
+    assert account.login_status.login_step == "idle"
+
+
+def test_every_update_bumps_version(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        before = account.login_status.version
+        account.update_login_status(generation, login_step="scanned")
+        account.update_login_status(image_url="http://example/qr.png")
+        return before
+
+    before = asyncio.run(run())
+    assert account.login_status.version == before + 2
+
+
+def test_step_event_fires_on_change_only(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        event = account.step_event
+        account.update_login_status(image_url="http://example/qr.png")
+        assert not event.is_set()
+        account.update_login_status(generation, login_step="scanned")
+        assert event.is_set()
+        assert await account.wait_for_step_change(event, timeout=0.01)
+        # 取得新事件后阶段没有再变化，等待超时
+        assert not await account.wait_for_step_change(account.step_event, timeout=0.01)
+
+    asyncio.run(run())
+
+
+def test_queue_position_change_wakes_waiters(account):
+    async def run():
+        generation = await account.begin_login("qr-1")
+        account.update_login_status(generation, login_step="confirmed")
+        account.update_login_status(generation, login_step="queued", queue_position=3, expected_wait_seconds=30.0)
+        event = account.step_event
+        account.update_login_status(generation, login_step="queued", queue_position=2, expected_wait_seconds=20.0)
+        assert event.is_set()
+        event = account.step_event
+        account.update_login_status(generation, login_step="queued", queue_position=2, expected_wait_seconds=18.0)
+        assert not event.is_set()
+
+    asyncio.run(run())
+    assert account.login_status.queue_position == 2
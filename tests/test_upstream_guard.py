@@ -0,0 +1,81 @@
+"""UpstreamGuard：失败计数、熔断和长轮询读超时"""
+
+import asyncio
+
+import httpx
+import pytest
+
+SCAN_URL = "http://upstream.test/wapi/zppassport/qrcode/scan?uuid=qr"
+JOBS_URL = "http://upstream.test/wapi/zpgeek/pc/recommend/job/list.json"
+
+
+class RaisingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, error: type):
+        self.error = error
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        raise self.error("boom", request=request)
+
+
+@pytest.fixture
+def guard(server):
+    return server.UpstreamGuard(global_rate=0, account_rate=0, failure_threshold=3, cooldown=30)
+
+
+def send(server, guard, error: type, url: str):
+    async def run():
+        transport = server._GuardedTransport(guard, "acc", RaisingTransport(error))
+        with pytest.raises(error):
+            await transport.handle_async_request(httpx.Request("GET", url))
+
+    asyncio.run(run())
+
+
+def test_long_poll_read_timeout_is_not_a_failure(server, guard):
+    send(server, guard, httpx.ReadTimeout, SCAN_URL)
+    assert guard._state("acc").failures == 0
+
+
+def test_connect_errors_count_on_every_endpoint(server, guard):
+    send(server, guard, httpx.ConnectError, SCAN_URL)
+    send(server, guard, httpx.PoolTimeout, JOBS_URL)
+    assert guard._state("acc").failures == 2
+
+
+def test_read_timeout_counts_on_regular_endpoints(server, guard):
+    send(server, guard, httpx.ReadTimeout, JOBS_URL)
+    assert guard._state("acc").failures == 1
+
+
+def test_breaker_opens_after_threshold_and_rejects_requests(server, guard):
+    for _ in range(guard.failure_threshold):
+        guard.record("acc", True)
+    assert guard.open_count == 1
+
+    async def run():
+        await guard.before_request("acc", httpx.Request("GET", JOBS_URL))
+
+    with pytest.raises(server.UpstreamCircuitOpen):
+        asyncio.run(run())
+
+
+def test_success_resets_failures_and_closes_breaker(guard):
+    for _ in range(guard.failure_threshold):
+        guard.record("acc", True)
+    guard.record("acc", False)
+    state = guard._state("acc")
+    assert (state.failures, state.not_before, state.opened_at) == (0, 0.0, None)
+    assert guard.open_count == 0
+
+
+def test_error_responses_count_as_failures(guard):
+    async def run():
+        request = httpx.Request("GET", JOBS_URL)
+        await guard.after_response("acc", httpx.Response(503, request=request))
+        await guard.after_response("acc", httpx.Response(200, json={"code": 37, "message": "busy"}, request=request))
+        failures = guard._state("acc").failures
+        await guard.after_response("acc", httpx.Response(200, json={"code": 0}, request=request))
+        return failures
+
+    assert asyncio.run(run()) == 2
+    assert guard._state("acc").failures == 0
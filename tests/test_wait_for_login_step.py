@@ -0,0 +1,37 @@
+"""wait_for_login_step_tool 丢失唤醒回归测试
+
+在工具上报进度（让出事件循环）的同时推进登录阶段，工具应立即返回而不是一直等到超时
+"""
+
+import asyncio
+import json
+import time
+
+from fastmcp import Client, Context
+
+TIMEOUT = 3.0
+
+
+def test_step_change_during_progress_report_wakes_waiter(server, monkeypatch):
+    async def run():
+        account = await server.state.get_account()
+        generation = await account.begin_login("wakeup-qr")
+        report_progress = Context.report_progress
+
+        async def advance_during_report(self, *args, **kwargs):
+            # 模拟监控任务恰好在上报进度期间收到扫码结果
+            if account.login_status.login_step == "qr_generated":
+                account.update_login_status(generation, login_step="scanned")
+            return await report_progress(self, *args, **kwargs)
+
+        monkeypatch.setattr(Context, "report_progress", advance_during_report)
+        async with Client(server.mcp) as client:
+            start = time.perf_counter()
+            result = await client.call_tool(
+                "wait_for_login_step_tool", {"target_step": "scanned", "timeout": TIMEOUT}
+            )
+            return json.loads(result.content[0].text), time.perf_counter() - start
+
+    payload, elapsed = asyncio.run(run())
+    assert payload["status"] == "reached"
+    assert elapsed < TIMEOUT / 2